@@ -0,0 +1,103 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import pygame
+import settings
+from sprite_cache import SpriteSheetCache
+from sound_manager import sound_files, load_sound
+import background
+import player
+from terrain import TERRAIN_IMAGE_URL, TERRAIN_WIDTH, TERRAIN_HEIGHT
+
+# 起動時に読み込むスプライトシート (path, cols, rows)
+SPRITE_SHEETS = [
+    (background.IMAGE_URL, background.IMAGE_COLS, background.IMAGE_ROWS),
+    (player.IMAGE_URL, player.IMAGE_COLS, player.IMAGE_ROWS),
+    (TERRAIN_IMAGE_URL, TERRAIN_WIDTH, TERRAIN_HEIGHT),
+]
+
+
+class AssetLoader:
+    """画像・効果音のデコードをスレッドプールで行い、進み具合と所要時間を記録する
+
+    ファイルの読み込みとデコードはワーカースレッドで行い、convert_alpha など
+    ディスプレイに関わる処理は install でメインスレッドから行う。
+    各アセットのデコード時間と、起動の各段階 (phase) の時間を report で出力できる。
+    """
+
+    def __init__(self, workers=settings.ASSET_LOADER_WORKERS):
+        self.workers = workers
+        self._executor = None
+        self._futures = {}  # name -> Future
+        self.timings = {}  # name -> デコードにかかった秒数 (ワーカースレッド)
+        self.phases = []  # (name, 秒数) メインスレッドでの各段階
+        self.marks = []  # (name, 秒数) 起動からの経過時間
+        self.start_time = time.perf_counter()
+        self.is_installed = False
+
+    @contextmanager
+    def phase(self, name):
+        """with ブロックの所要時間を起動の段階として記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def mark(self, name):
+        """起動 (AssetLoader の作成) からの経過時間を記録する"""
+        self.marks.append((name, time.perf_counter() - self.start_time))
+
+    def start(self, load_sounds=True):
+        """スプライトシートと効果音 (load_sounds が True の場合) のデコードを始める"""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="AssetLoader")
+        for filename, cols, rows in SPRITE_SHEETS:
+            self._submit(("sheet", filename, cols, rows), pygame.image.load, filename)
+        if load_sounds:
+            for sound_name, sound_path in sound_files():
+                self._submit(("sound", sound_name), load_sound, sound_path)
+        # 以降の依頼はないので、終わったらスレッドを片付ける
+        self._executor.shutdown(wait=False)
+
+    def _submit(self, name, func, *args):
+        def timed():
+            start = time.perf_counter()
+            result = func(*args)
+            self.timings[name] = time.perf_counter() - start
+            return result
+        self._futures[name] = self._executor.submit(timed)
+
+    def progress(self):
+        """デコードの終わった割合 (0.0〜1.0)"""
+        if not self._futures:
+            return 1.0
+        done = sum(1 for future in self._futures.values() if future.done())
+        return done / len(self._futures)
+
+    def is_done(self):
+        return all(future.done() for future in self._futures.values())
+
+    def install(self, sound_manager=None):
+        """デコードが終わるまで待ち、結果をキャッシュと sound_manager に登録する"""
+        if self.is_installed:
+            return
+        with self.phase("assets.wait"):
+            results = {name: future.result() for name, future in self._futures.items()}
+        with self.phase("assets.install"):
+            for name, result in results.items():
+                if name[0] == "sheet":
+                    _, filename, cols, rows = name
+                    SpriteSheetCache.add_sheet(filename, cols, rows, result)
+                elif sound_manager is not None:
+                    sound_manager.add_sound(name[1], result)
+        self.is_installed = True
+
+    def report(self):
+        """起動時間の内訳を文字列のリストで返す"""
+        lines = [f"{name}: {seconds * 1000:.1f}ms" for name, seconds in self.phases]
+        for name, seconds in self.marks:
+            lines.append(f"{name}: 起動から {seconds * 1000:.1f}ms")
+        for name, seconds in sorted(self.timings.items(), key=lambda item: -item[1]):
+            lines.append(f"  decode {name[1]}: {seconds * 1000:.1f}ms")
+        return lines
@@ -22,7 +22,7 @@ class Background(SpriteWithFrames):
         pass
 
     def draw(self):
-        super().draw(
+        return super().draw(
             magnification_rate=1,
             is_center=False,
         )
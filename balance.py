@@ -0,0 +1,297 @@
+"""シードを変えたヘッドレスのプレイを大量に実行し、ゲームバランスの統計をとる
+
+    python balance.py [n_stage1.json ...] [--episodes 1000] [--policy random]
+                      [--spawn-interval 60] [--output balance.jsonl]
+
+ボットの操作 (policy) で Stage を最大 --max-frames フレーム進める。
+1回のプレイ (エピソード) の結果は、終わったものから JSONL で1行ずつ書き出す。
+最後にクリア率 (95% 信頼区間)・クリアまでの時間・原因別のダメージ・
+敵の数の推移をまとめて表示する。プレイは CPU コア数のプロセスで並列に実行する。
+"""
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from headless import use_dummy_drivers, InputState, NullMixer
+
+use_dummy_drivers()
+
+import pygame  # noqa: E402
+import settings  # noqa: E402
+from sound_manager import NullSoundManager  # noqa: E402
+from stage import Stage  # noqa: E402
+
+MAX_FRAMES = 3600  # 1エピソードの最大フレーム数
+ENEMY_SAMPLE_INTERVAL = 60  # 敵の数を記録する間隔 (フレーム数)
+BATCH_SIZE = 8  # 1つのワーカーにまとめて渡すエピソード数
+
+
+class RandomPolicy:
+    """ランダムに入力を選び、ランダムなフレーム数だけ続ける"""
+
+    CHOICES = (
+        (), (pygame.K_LEFT,), (pygame.K_RIGHT,), (pygame.K_SPACE,),
+        (pygame.K_LEFT, pygame.K_SPACE), (pygame.K_RIGHT, pygame.K_SPACE),
+    )
+
+    def __init__(self, rng, inputs=None):
+        self.rng = rng
+        self.keys = ()
+        self.hold = 0
+
+    def next_keys(self, stage):
+        if self.hold <= 0:
+            self.keys = self.rng.choice(self.CHOICES)
+            self.hold = self.rng.randint(1, 30)
+        self.hold -= 1
+        return self.keys
+
+
+class RightPolicy:
+    """右に進み続け、止まったら (壁にぶつかったら) ジャンプする"""
+
+    def __init__(self, rng, inputs=None):
+        self.rng = rng
+
+    def next_keys(self, stage):
+        if stage.player.dx == 0 or self.rng.random() < 0.02:
+            return (pygame.K_RIGHT, pygame.K_SPACE)
+        return (pygame.K_RIGHT,)
+
+
+class SolverPolicy:
+    """solver.py で求めた最短の入力列をたどる (やられたら最初からたどり直す)"""
+
+    KEYS = {"L": pygame.K_LEFT, "R": pygame.K_RIGHT, "J": pygame.K_SPACE}
+
+    def __init__(self, rng, inputs=None):
+        self.inputs = [
+            tuple(self.KEYS[c] for c in name if c in self.KEYS)
+            for name, count in inputs or []
+            for _ in range(count)
+        ]
+        self.index = 0
+        self.deaths = 0
+
+    def next_keys(self, stage):
+        if stage.deaths != self.deaths:
+            self.deaths = stage.deaths
+            self.index = 0
+        if self.index >= len(self.inputs):
+            return ()
+        self.index += 1
+        return self.inputs[self.index - 1]
+
+
+POLICIES = {
+    "random": RandomPolicy,
+    "right": RightPolicy,
+    "solver": SolverPolicy,
+}
+
+_stage = None  # ワーカープロセスごとに使い回す Stage
+_input_state = None
+
+
+def _init_worker():
+    global _input_state
+    pygame.init()
+    pygame.display.set_mode((settings.WIDTH, settings.HEIGHT))
+    _input_state = InputState()
+
+
+def run_episode(stage_file, policy_name, seed, max_frames=MAX_FRAMES,
+                spawn_interval=None, inputs=None):
+    """1エピソード実行し、結果を辞書で返す"""
+    global _stage
+    if _stage is None:
+        _stage = Stage(
+            pygame.display.get_surface(), stage_file, NullMixer(),
+            NullSoundManager(), _input_state, seed, render=False)
+    else:
+        _stage.load(stage_file, seed)
+    stage = _stage
+    if spawn_interval is not None:
+        stage.enemy_spawn_interval = spawn_interval
+    policy = POLICIES[policy_name](random.Random(seed ^ 0x5EED), inputs)
+
+    enemy_counts = []
+    frames = 0
+    while frames < max_frames and not stage.is_clearing:
+        _input_state.set(policy.next_keys(stage))
+        stage.update()
+        frames += 1
+        if frames % ENEMY_SAMPLE_INTERVAL == 0:
+            enemy_counts.append(len(stage.enemies))
+    return {
+        "stage": stage_file,
+        "policy": policy_name,
+        "seed": seed,
+        "cleared": stage.is_clearing,
+        "frames": frames,
+        "deaths": stage.deaths,
+        "damage": dict(stage.damage_taken),
+        "enemy_counts": enemy_counts,
+    }
+
+
+def run_batch(stage_file, policy_name, seeds, max_frames, spawn_interval, inputs):
+    return [
+        run_episode(stage_file, policy_name, seed, max_frames, spawn_interval, inputs)
+        for seed in seeds
+    ]
+
+
+def wilson_interval(successes, total, z=1.96):
+    """二項分布の割合の 95% 信頼区間 (Wilson スコア区間)"""
+    if total == 0:
+        return 0.0, 0.0
+    p = successes / total
+    denominator = 1 + z * z / total
+    center = (p + z * z / (2 * total)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / total + z * z / (4 * total * total)) / denominator
+    return max(center - margin, 0.0), min(center + margin, 1.0)
+
+
+def summarize(results):
+    """エピソードの結果をステージごとに集計する"""
+    summaries = {}
+    for stage_file in sorted({result["stage"] for result in results}):
+        stage_results = [result for result in results if result["stage"] == stage_file]
+        cleared = [result for result in stage_results if result["cleared"]]
+        low, high = wilson_interval(len(cleared), len(stage_results))
+        clear_seconds = [result["frames"] / settings.SIMULATION_FPS for result in cleared]
+        samples = max((len(result["enemy_counts"]) for result in stage_results), default=0)
+        enemy_counts = []
+        for i in range(samples):
+            # その時点でまだプレイが続いていたエピソードだけで平均する
+            counts = [result["enemy_counts"][i] for result in stage_results
+                      if i < len(result["enemy_counts"])]
+            enemy_counts.append(statistics.fmean(counts))
+        summaries[stage_file] = {
+            "episodes": len(stage_results),
+            "clear_rate": len(cleared) / len(stage_results),
+            "clear_rate_95": [low, high],
+            "clear_seconds_mean": statistics.fmean(clear_seconds) if clear_seconds else None,
+            "clear_seconds_median": statistics.median(clear_seconds) if clear_seconds else None,
+            "deaths_mean": statistics.fmean(result["deaths"] for result in stage_results),
+            "damage_mean": {
+                cause: statistics.fmean(result["damage"][cause] for result in stage_results)
+                for cause in stage_results[0]["damage"]
+            },
+            "enemy_counts_mean": enemy_counts,
+        }
+    return summaries
+
+
+def print_summary(summaries):
+    for stage_file, summary in summaries.items():
+        low, high = summary["clear_rate_95"]
+        print(f"{stage_file}: {summary['episodes']} episodes")
+        print(f"  clear rate: {summary['clear_rate'] * 100:.1f}% "
+              f"(95% CI {low * 100:.1f}-{high * 100:.1f}%)")
+        if summary["clear_seconds_mean"] is not None:
+            print(f"  time to clear: mean {summary['clear_seconds_mean']:.1f}s, "
+                  f"median {summary['clear_seconds_median']:.1f}s")
+        damage = summary["damage_mean"]
+        print(f"  deaths: {summary['deaths_mean']:.2f}  hp lost: "
+              + ", ".join(f"{cause} {value:.1f}" for cause, value in damage.items()))
+        counts = summary["enemy_counts_mean"]
+        step = max(len(counts) // 6, 1)
+        print("  enemies: " + ", ".join(
+            f"{(i + 1) * ENEMY_SAMPLE_INTERVAL // settings.SIMULATION_FPS}s {counts[i]:.1f}"
+            for i in range(0, len(counts), step)))
+
+
+def solver_inputs(stage_files):
+    """solver.py の最短の入力列 (キャッシュがあればそれを使う)"""
+    from solver import solve_stages
+    results = solve_stages(stage_files)
+    return {
+        stage_file: result["inputs"] if result["solvable"] else []
+        for stage_file, result in results.items()
+    }
+
+
+def run(stage_files, episodes, policy_name, seed=0, max_frames=MAX_FRAMES,
+        spawn_interval=None, jobs=None, output=None):
+    """ステージごとに episodes 回ずつ実行し、集計結果を返す
+
+    seed から seed + episodes - 1 までのシードを使うので、同じ引数なら同じ結果になる。
+    output を指定した場合は、エピソードの結果を終わったものから JSONL で書き出す。
+    """
+    inputs = solver_inputs(stage_files) if policy_name == "solver" else {}
+    results = []
+    start = time.perf_counter()
+    out = open(output, "w") if output else None
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as executor:
+            futures = []
+            for stage_file in stage_files:
+                seeds = list(range(seed, seed + episodes))
+                for i in range(0, episodes, BATCH_SIZE):
+                    futures.append(executor.submit(
+                        run_batch, stage_file, policy_name, seeds[i:i + BATCH_SIZE],
+                        max_frames, spawn_interval, inputs.get(stage_file)))
+            for future in as_completed(futures):
+                for result in future.result():
+                    results.append(result)
+                    if out is not None:
+                        out.write(json.dumps(result) + "\n")
+                if out is not None:
+                    out.flush()
+                print(f"\r{len(results)}/{len(stage_files) * episodes} episodes "
+                      f"({time.perf_counter() - start:.1f}s)", end="", file=sys.stderr)
+        print(file=sys.stderr)
+    finally:
+        if out is not None:
+            out.close()
+    return summarize(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="シードを変えたヘッドレスのプレイを大量に実行し、ゲームバランスの統計をとる")
+    parser.add_argument(
+        "stages", nargs="*",
+        help="maps/ 以下のステージファイル名 (省略した場合は settings.STAGE_FILE_NAMES)")
+    parser.add_argument(
+        "--episodes", type=int, default=1000,
+        help="ステージごとのエピソード数")
+    parser.add_argument(
+        "--policy", choices=list(POLICIES), default="random",
+        help="ボットの操作 (solver は solver.py の最短の入力列をたどる)")
+    parser.add_argument(
+        "--seed", type=int, default=0,
+        help="最初のエピソードのシード (以降は1ずつ増やす)")
+    parser.add_argument(
+        "--max-frames", type=int, default=MAX_FRAMES,
+        help="1エピソードの最大フレーム数")
+    parser.add_argument(
+        "--spawn-interval", type=int, default=None,
+        help="敵を生成する間隔 (フレーム数、省略した場合はゲームと同じ)")
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="並列に実行するプロセス数 (省略した場合は CPU コア数)")
+    parser.add_argument(
+        "--output", metavar="FILE",
+        help="エピソードごとの結果を書き出す JSONL ファイル")
+    parser.add_argument(
+        "--summary", metavar="FILE",
+        help="集計結果を書き出す JSON ファイル")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    summaries = run(
+        args.stages or settings.STAGE_FILE_NAMES, args.episodes, args.policy,
+        args.seed, args.max_frames, args.spawn_interval, args.jobs, args.output)
+    print_summary(summaries)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
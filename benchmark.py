@@ -0,0 +1,302 @@
+"""ホットパスのベンチマーク
+
+    python benchmark.py [--output results.json] [--compare old.json] [--filter map_load]
+
+画面のない環境でも動くよう SDL の dummy ドライバで実行する。
+結果は JSON に保存でき、--compare で以前の結果と比較できる。
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from headless import use_dummy_drivers, InputState, NullMixer
+
+use_dummy_drivers()
+
+import pygame  # noqa: E402
+import settings  # noqa: E402
+from dirty_renderer import DirtyRectRenderer  # noqa: E402
+from enemy import Enemy  # noqa: E402
+from enemy_system import EnemySystem, np  # noqa: E402
+from map import Map  # noqa: E402
+from map_editor import MapEditor  # noqa: E402
+from player import Player  # noqa: E402
+from sound_manager import NullSoundManager  # noqa: E402
+from stage import Stage  # noqa: E402
+from stage_cache import StageCache  # noqa: E402
+from stage_format import (  # noqa: E402
+    BINARY_EXTENSION, COMPRESSIONS, read_stage_tiles, to_stage_tiles, write_stage)
+
+MIN_TIME = 0.5  # 1つのベンチマークを繰り返す最低秒数
+SYNTHETIC_SEED = 0
+
+
+def make_synthetic_map(cols, rows, density, seed=SYNTHETIC_SEED):
+    """最下段が地面で、残りのマスを density の割合で埋めたマップデータを作る"""
+    rng = random.Random(seed)
+    map_data = []
+    for y in range(rows):
+        if y == rows - 1:
+            map_data.append([1] * cols)
+            continue
+        map_data.append([
+            rng.randint(1, 9) if rng.random() < density else 0
+            for _ in range(cols)
+        ])
+    return {"map_name": f"synthetic {cols}x{rows} ({density:.0%})", "map_data": map_data}
+
+
+def load_map_data(filename):
+    with open(os.path.join("maps", filename), "r") as f:
+        return json.load(f)
+
+
+def build_map(surface, map_data):
+    stage_map = Map(surface)
+    stage_map.load_stage(to_stage_tiles(map_data))
+    return stage_map
+
+
+def measure(func, min_time=MIN_TIME):
+    """func を min_time 秒以上繰り返し、ops/sec とメモリのピークを返す"""
+    func()  # ウォームアップ (キャッシュの初期化などを計測から外す)
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    count = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time:
+        func()
+        count += 1
+        elapsed = time.perf_counter() - start
+    return {
+        "ops_per_sec": count / elapsed,
+        "mean_ms": elapsed / count * 1000,
+        "peak_memory_kb": peak / 1024,
+    }
+
+
+def bench_map_load(surface, temp_dir):
+    cases = {}
+    for path in sorted(glob.glob(os.path.join("maps", "*.json"))):
+        filename = os.path.basename(path)
+
+        def load(filename=filename):
+            StageCache.invalidate(filename)
+            Map(surface).load_map(filename)
+        cases[f"map_load[{filename}]"] = load
+
+        # やられたときのリセット (キャッシュ済みのステージを読み込み直す)
+        stage_map = Map(surface)
+        stage_map.load_map(filename)
+        cases[f"map_reset[{filename}]"] = (
+            lambda stage_map=stage_map, filename=filename: stage_map.load_map(filename))
+
+    for cols, rows, density in ((24, 18, 0.9), (240, 18, 0.3), (480, 36, 0.3)):
+        stage = to_stage_tiles(make_synthetic_map(cols, rows, density))
+
+        def make_objects(stage=stage):
+            Map(surface).load_stage(stage)
+        cases[f"make_objects[{cols}x{rows}@{density}]"] = make_objects
+
+    # ステージファイルの読み込み (JSON とバイナリ形式の比較)
+    map_data = make_synthetic_map(480, 36, 0.3)
+    json_path = os.path.join(temp_dir, "stage.json")
+    with open(json_path, "w") as f:
+        json.dump(map_data, f, indent=4)
+
+    def parse_json():
+        with open(json_path, "r") as f:
+            to_stage_tiles(json.load(f))
+    cases["stage_parse[json 480x36]"] = parse_json
+    for compression in COMPRESSIONS:
+        path = os.path.join(temp_dir, f"stage_{compression}{BINARY_EXTENSION}")
+        write_stage(path, map_data["map_name"], map_data["map_data"], compression)
+        cases[f"stage_parse[{compression} 480x36]"] = (
+            lambda path=path: read_stage_tiles(path))
+    return cases
+
+
+def bench_player_collision(surface, temp_dir):
+    cases = {}
+    input_state = InputState({pygame.K_RIGHT, pygame.K_SPACE})
+    for name, map_data in (
+        ("n_stage1.json", load_map_data("n_stage1.json")),
+        ("synthetic 480x36", make_synthetic_map(480, 36, 0.3)),
+    ):
+        stage_map = build_map(surface, map_data)
+        player = Player(surface, stage_map, (30, 30), NullSoundManager(), input_state)
+
+        def update(player=player):
+            player.update()
+            if player.rect.y > settings.HEIGHT or player.rect.right >= settings.WIDTH:
+                player.rect.topleft = (30, 30)
+                player.dy = 0
+        cases[f"player_update[{name}]"] = update
+    return cases
+
+
+def bench_enemy_update(surface, temp_dir):
+    cases = {}
+    stage_map = build_map(surface, load_map_data("n_stage1.json"))
+    player = Player(surface, stage_map, (30, 30), NullSoundManager(), InputState())
+    for count in (10, 100, 1000):
+        rng = random.Random(SYNTHETIC_SEED)
+        enemies = [
+            Enemy(surface, rng.randint(0, settings.WIDTH - 20), rng.randint(0, settings.HEIGHT // 2))
+            for _ in range(count)
+        ]
+
+        def update(enemies=enemies, rng=rng):
+            for i, enemy in enumerate(enemies):
+                enemy.update(stage_map, player)
+                if enemy.is_out_of_screen():
+                    enemies[i] = Enemy(surface, rng.randint(0, settings.WIDTH - 20), -20)
+        cases[f"enemy_update[{count}]"] = update
+
+    if np is None:
+        return cases
+    for count in (100, 1000, 5000):
+        rng = random.Random(SYNTHETIC_SEED)
+        system = EnemySystem(surface)
+        for _ in range(count):
+            system.spawn(rng.randint(0, settings.WIDTH - 20), rng.randint(0, settings.HEIGHT // 2))
+
+        def update_system(system=system, count=count, rng=rng):
+            system.update(stage_map, player)
+            # 取り除かれた分を補充して数を保つ
+            for _ in range(count - len(system)):
+                system.spawn(rng.randint(0, settings.WIDTH - 20), -20)
+        cases[f"enemy_system_update[{count}]"] = update_system
+    return cases
+
+
+def bench_sprite_draw(surface, temp_dir):
+    stage_map = build_map(surface, load_map_data("n_stage1.json"))
+    player = Player(surface, stage_map, (300, 300), NullSoundManager(), InputState())
+    player.previous_positions = [(pygame.Rect(player.rect), player.frame_index)]
+    state = {"frame": 0}
+
+    def draw_player():
+        # 向きとアニメーションフレームを切り替えながら描画する
+        state["frame"] += 1
+        player.frame_index = state["frame"] % player.image_cols
+        player.image_is_reverse = state["frame"] % 120 < 60
+        player.draw()
+
+    return {
+        "sprite_draw[player]": draw_player,
+        "map_draw[n_stage1.json]": stage_map.draw,
+    }
+
+
+def bench_frame_render(surface, temp_dir):
+    # 敵がいる状態のステージを、画面全体の描き直しと差分の描き直しで比べる
+    cases = {}
+    for name in ("full", "dirty"):
+        stage = Stage(surface, "n_stage1.json", NullMixer(), NullSoundManager(),
+                      InputState({pygame.K_RIGHT}), seed=SYNTHETIC_SEED)
+        for _ in range(300):
+            stage.update()
+        renderer = DirtyRectRenderer(surface) if name == "dirty" else None
+
+        def render(stage=stage, renderer=renderer):
+            stage.update()
+            if renderer is None:
+                surface.fill(settings.COLORS["black"])
+                stage.draw()
+                pygame.display.update()
+            else:
+                pygame.display.update(renderer.draw(stage))
+        cases[f"frame_render[{name}]"] = render
+    return cases
+
+
+def bench_editor(surface, temp_dir):
+    # 選択画面を出さないように __init__ を通さずにエディターを組み立てる
+    editor = MapEditor.__new__(MapEditor)
+    editor.surface = surface
+    editor.header_height = 50
+    editor.footer_height = 80
+    editor.map_in_editing = load_map_data("n_stage1.json")["map_data"]
+    editor.terrain_color = 1
+    editor.mouse_terrain = None
+    return {"editor_update_terrains[n_stage1.json]": editor._update_terrains}
+
+
+BENCHMARKS = (
+    bench_map_load,
+    bench_player_collision,
+    bench_enemy_update,
+    bench_sprite_draw,
+    bench_frame_render,
+    bench_editor,
+)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(name_filter=None, min_time=MIN_TIME):
+    pygame.init()
+    surface = pygame.display.set_mode((settings.WIDTH, settings.HEIGHT))
+    results = {}
+    # 計測用に書き出すファイルは temp_dir に置き、終わったら消す
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for bench in BENCHMARKS:
+            for name, func in bench(surface, temp_dir).items():
+                if name_filter and name_filter not in name:
+                    continue
+                results[name] = measure(func, min_time)
+                print(
+                    f"{name:45s} {results[name]['ops_per_sec']:12.1f} ops/s "
+                    f"{results[name]['mean_ms']:10.4f} ms "
+                    f"{results[name]['peak_memory_kb']:10.1f} KB")
+    pygame.quit()
+    return {"revision": git_revision(), "results": results}
+
+
+def compare(current, previous):
+    print(f"\n比較: {previous.get('revision')} -> {current.get('revision')}")
+    for name, result in current["results"].items():
+        old = previous["results"].get(name)
+        if old is None:
+            continue
+        ratio = result["ops_per_sec"] / old["ops_per_sec"]
+        print(f"{name:45s} x{ratio:.2f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ホットパスのベンチマーク")
+    parser.add_argument("--output", metavar="FILE", help="結果を JSON で保存する")
+    parser.add_argument("--compare", metavar="FILE", help="以前の結果 (JSON) と比較する")
+    parser.add_argument("--filter", help="名前にこの文字列を含むベンチマークだけ実行する")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME,
+                        help="1つのベンチマークを繰り返す最低秒数")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run(args.filter, args.min_time)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,29 @@
+import pygame
+import settings
+
+
+class Camera:
+    """画面に映すワールド上の範囲
+
+    追従対象が画面中央に来るように動き、ワールドの端より外は映さない。
+    描画時は offset を足してワールド座標を画面座標に変換する。
+    """
+
+    def __init__(self, width=settings.WIDTH, height=settings.HEIGHT):
+        self.rect = pygame.Rect(0, 0, width, height)
+
+    @property
+    def offset(self):
+        return (-self.rect.x, -self.rect.y)
+
+    def follow(self, target_rect, world_width, world_height):
+        self.rect.center = target_rect.center
+        # ワールドの端で止める (ワールドが画面より小さい場合は左上に合わせる)
+        self.rect.right = min(self.rect.right, world_width)
+        self.rect.bottom = min(self.rect.bottom, world_height)
+        self.rect.left = max(self.rect.left, 0)
+        self.rect.top = max(self.rect.top, 0)
+
+    def apply(self, rect):
+        """ワールド座標の rect を画面座標に変換したものを返す"""
+        return rect.move(-self.rect.x, -self.rect.y)
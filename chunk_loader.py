@@ -0,0 +1,146 @@
+import time
+import settings
+import worker
+
+
+class LoadedChunk:
+    """作成済みのチャンク (描画用のサーフェス)"""
+
+    def __init__(self, image):
+        self.image = image
+        self.nbytes = image.get_pitch() * image.get_height()
+
+
+class ChunkLoaderStats:
+    """チャンク読み込みの統計 (ストールと先読みの失敗)"""
+
+    def __init__(self):
+        self.requested = 0  # ワーカースレッドに依頼した数
+        self.hits = 0  # 必要になった時点で作成済みだった数
+        self.misses = 0  # 必要になった時点で作成が終わっていなかった数 (先読みの失敗)
+        self.stalls = 0  # メインスレッドが作成を待った回数
+        self.stall_time = 0.0  # メインスレッドが待った合計時間 (秒)
+        self.max_stall = 0.0  # 1回の待ち時間の最大 (秒)
+        self.evictions = 0  # メモリの上限を超えたため捨てた数
+
+    def add_stall(self, seconds):
+        self.stalls += 1
+        self.stall_time += seconds
+        self.max_stall = max(self.max_stall, seconds)
+
+    def summary(self):
+        return {
+            "requested": self.requested,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stalls": self.stalls,
+            "stall_ms": self.stall_time * 1000,
+            "max_stall_ms": self.max_stall * 1000,
+            "evictions": self.evictions,
+        }
+
+
+class ChunkLoader:
+    """チャンクの描画サーフェスをワーカースレッドで作っておく
+
+    request したチャンクはワーカースレッドで作り、poll で受け取る。
+    作り終わっていないチャンクを take した場合だけメインスレッドが待つ。
+    作ったチャンクは settings.CHUNK_MEMORY_BUDGET まで残しておき、
+    超えたらカメラから遠いものから捨てる。
+    """
+
+    def __init__(self, tile_layer, threaded=None):
+        self.tile_layer = tile_layer
+        if threaded is None:
+            threaded = settings.USE_CHUNK_STREAMING
+        self.threaded = threaded
+        self.loaded = {}  # (chunk_x, chunk_y) -> LoadedChunk
+        self.loaded_bytes = 0
+        self.pending = {}  # (chunk_x, chunk_y) -> Future
+        self.stats = ChunkLoaderStats()
+
+    def has(self, key):
+        """作成済み・作成中なら True"""
+        return key in self.loaded or key in self.pending
+
+    def request(self, key, tiles):
+        """チャンクの作成をワーカースレッドに依頼する (作成済み・依頼済みなら何もしない)
+
+        tiles は作成中に書き換わらないもの (コピーなど) を渡すこと。
+        """
+        if not self.threaded or self.has(key):
+            return
+        self.pending[key] = worker.submit(self._build, tiles)
+        self.stats.requested += 1
+
+    def poll(self):
+        """作り終わったチャンクを受け取る (待たない)"""
+        for key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[key]
+                self._store(key, future.result())
+
+    def take(self, key, get_tiles, count_stats=True):
+        """チャンクを返す。作り終わっていなければ待つか、get_tiles(key) の地形からその場で作る
+
+        count_stats が False のとき (マップの読み込み直後など) は統計に数えない。
+        """
+        chunk = self.loaded.get(key)
+        if chunk is not None:
+            if count_stats:
+                self.stats.hits += 1
+            return chunk
+
+        start = time.perf_counter()
+        future = self.pending.pop(key, None)
+        if future is not None:
+            chunk = future.result()
+        else:
+            chunk = self._build(get_tiles(key))
+        if count_stats:
+            self.stats.misses += 1
+            self.stats.add_stall(time.perf_counter() - start)
+        self._store(key, chunk)
+        return chunk
+
+    def invalidate(self, key):
+        """地形が書き換わったチャンクを作り直すため、作成済みのものを捨てる"""
+        future = self.pending.pop(key, None)
+        if future is not None:
+            future.cancel()
+        chunk = self.loaded.pop(key, None)
+        if chunk is not None:
+            self.loaded_bytes -= chunk.nbytes
+
+    def evict(self, in_use, center):
+        """メモリの上限を超えた分を、center (チャンク座標) から遠いものから捨てる
+
+        in_use に含まれるチャンク (画面付近で使用中) は捨てない。
+        """
+        if self.loaded_bytes <= settings.CHUNK_MEMORY_BUDGET:
+            return
+        candidates = sorted(
+            (key for key in self.loaded if key not in in_use),
+            key=lambda key: max(abs(key[0] - center[0]), abs(key[1] - center[1])),
+            reverse=True,
+        )
+        for key in candidates:
+            if self.loaded_bytes <= settings.CHUNK_MEMORY_BUDGET:
+                break
+            self.loaded_bytes -= self.loaded.pop(key).nbytes
+            self.stats.evictions += 1
+
+    def clear(self):
+        for future in self.pending.values():
+            future.cancel()
+        self.pending = {}
+        self.loaded = {}
+        self.loaded_bytes = 0
+
+    def _store(self, key, chunk):
+        self.loaded[key] = chunk
+        self.loaded_bytes += chunk.nbytes
+
+    def _build(self, tiles):
+        # ワーカースレッドで実行される (共有する状態は変更しない)
+        return LoadedChunk(self.tile_layer.render_chunk(tiles))
@@ -0,0 +1,83 @@
+import pygame
+
+
+def merge_rects(rects):
+    """重なっている Rect をまとめ、空の Rect を取り除く
+
+    前のフレームと今のフレームの同じ物の Rect はほとんど重なっているので、
+    まとめたほうが display.update で転送する画素が少なくなる。
+    """
+    merged = []
+    for rect in rects:
+        if rect.width <= 0 or rect.height <= 0:
+            continue
+        rect = pygame.Rect(rect)
+        i = 0
+        while i < len(merged):
+            other = merged[i]
+            union = rect.union(other)
+            # まとめても面積がほとんど増えないときだけまとめる
+            if union.width * union.height <= (
+                    rect.width * rect.height + other.width * other.height):
+                rect = union
+                merged.pop(i)
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
+
+
+class DirtyRectRenderer:
+    """変化した範囲だけを描き直し、pygame.display.update に渡す Rect のリストを返す
+
+    背景と地形はカメラ・ステージ・地形が変わらない限り同じなので、一度描いたものを
+    static_layer に取っておく。毎フレーム、前のフレームで敵・プレイヤー・UI を
+    描いた範囲を static_layer から戻してから描き直す。
+    カメラが動いたときやステージが変わったときは画面全体を描き直す。
+    """
+
+    def __init__(self, surface):
+        self.surface = surface
+        self.static_layer = pygame.Surface(surface.get_size()).convert()
+        self._static_key = None
+        self._previous_rects = []
+        # 統計 (画面全体を描き直した回数・display.update に渡した画素数)
+        self.frames = 0
+        self.full_redraws = 0
+        self.updated_pixels = 0
+
+    def invalidate(self):
+        """次のフレームで画面全体を描き直す (タイトル画面から戻ったときなど)"""
+        self._static_key = None
+
+    def draw(self, stage, alpha=1.0):
+        """stage を描画し、更新が必要な範囲を返す (None なら画面全体)"""
+        self.frames += 1
+        offset = stage.view_offset(alpha)
+        static_key = (
+            stage.stage_file_name, stage.map.revision, offset, stage.draw_background)
+        if static_key != self._static_key:
+            self._static_key = static_key
+            self.full_redraws += 1
+            stage.draw_static(offset)
+            self.static_layer.blit(self.surface, (0, 0))
+            self._previous_rects = stage.draw_dynamic(offset, alpha)
+            self.updated_pixels += self.surface.get_width() * self.surface.get_height()
+            return None
+
+        # 前のフレームで描いた範囲を背景・地形に戻す
+        for rect in self._previous_rects:
+            self.surface.blit(self.static_layer, rect, rect)
+        rects = stage.draw_dynamic(offset, alpha)
+        dirty_rects = merge_rects(self._previous_rects + rects)
+        self._previous_rects = rects
+        self.updated_pixels += sum(rect.width * rect.height for rect in dirty_rects)
+        return dirty_rects
+
+    def coverage(self):
+        """1フレームあたりに更新した画素の、画面全体に対する割合"""
+        if self.frames == 0:
+            return 0.0
+        screen_pixels = self.surface.get_width() * self.surface.get_height()
+        return self.updated_pixels / (self.frames * screen_pixels)
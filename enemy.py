@@ -1,5 +1,6 @@
 import pygame
 import settings
+from profiler import profiler
 
 
 class Enemy:
@@ -13,6 +14,9 @@ class Enemy:
         self.speed_x = 0.5  # 横移動の速度
         self.gravity = 0.2
         self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        # 1回前の更新時の位置 (描画の補間に使う)
+        self.prev_x = x
+        self.prev_y = y
         self.color = settings.COLORS["red"]
         self.is_on_ground = False
         self.direction = 1  # 1: 右, -1: 左
@@ -20,6 +24,15 @@ class Enemy:
         self.jump_distance = 100  # ジャンプで進める距離
 
     def can_reach_other_side(self, map, direction):
+        # 同じ位置・向きの結果はマップ側の表に記録しておき、再計算しない
+        key = (self.x, self.y, direction)
+        can_reach = map.reachability.get(key)
+        if can_reach is None:
+            can_reach = self._simulate_jump(map, direction)
+            map.reachability[key] = can_reach
+        return can_reach
+
+    def _simulate_jump(self, map, direction):
         # 仮想的にジャンプして、向こう岸にたどり着けるかチェック
         test_x = self.x
         test_y = self.y
@@ -32,9 +45,8 @@ class Enemy:
             test_rect = pygame.Rect(test_x, test_y, self.width, self.height)
 
             # 地形との衝突判定
-            for terrain in map.map_objects:
-                if pygame.Rect.colliderect(test_rect, terrain.rect):
-                    return False
+            if map.tiles_overlapping(test_rect):
+                return False
 
             # 重力による落下
             test_speed_y += self.gravity
@@ -42,13 +54,14 @@ class Enemy:
 
             # 地面に着地したかチェック
             test_rect.y = test_y
-            for terrain in map.map_objects:
-                if pygame.Rect.colliderect(test_rect, terrain.rect):
-                    return True
+            if map.tiles_overlapping(test_rect):
+                return True
 
         return False
 
     def update(self, map, player):
+        self.prev_x = self.x
+        self.prev_y = self.y
         # プレイヤーの方向を常に更新
         if player.rect.x > self.x:
             self.direction = 1
@@ -66,14 +79,13 @@ class Enemy:
             self.rect.y = self.y
 
             # 地形との衝突判定
-            for terrain in map.map_objects:
-                if pygame.Rect.colliderect(self.rect, terrain.rect):
-                    # ブロックの上に乗る
-                    self.y = terrain.rect.top - self.height
-                    self.rect.y = self.y
-                    self.speed_y = 0
-                    self.is_on_ground = True
-                    break
+            for terrain in map.tiles_overlapping(self.rect):
+                # ブロックの上に乗る
+                self.y = terrain.rect.top - self.height
+                self.rect.y = self.y
+                self.speed_y = 0
+                self.is_on_ground = True
+                break
         else:
             # 横移動
             self.x += self.speed_x * self.direction
@@ -81,31 +93,34 @@ class Enemy:
 
             # 地形との衝突判定（横移動時）
             is_blocked = False
-            for terrain in map.map_objects:
-                if pygame.Rect.colliderect(self.rect, terrain.rect):
-                    # ブロックにぶつかったら反対方向に移動
-                    self.direction *= -1
-                    self.x += self.speed_x * self.direction
-                    self.rect.x = self.x
-                    is_blocked = True
-                    break
+            if map.tiles_overlapping(self.rect):
+                # ブロックにぶつかったら反対方向に移動
+                self.direction *= -1
+                self.x += self.speed_x * self.direction
+                self.rect.x = self.x
+                is_blocked = True
 
             # 地面との衝突判定（落下防止）
-            is_on_ground = False
             self.rect.y += 1  # 1ピクセル下に移動して地面チェック
-            for terrain in map.map_objects:
-                if pygame.Rect.colliderect(self.rect, terrain.rect):
-                    is_on_ground = True
-                    break
+            is_on_ground = bool(map.tiles_overlapping(self.rect))
             self.rect.y -= 1  # 元の位置に戻す
 
-            if not is_on_ground or (is_blocked and self.can_reach_other_side(map, self.direction)):
+            can_reach = False
+            if is_on_ground and is_blocked:
+                with profiler.section("Enemy.can_reach_other_side"):
+                    can_reach = self.can_reach_other_side(map, self.direction)
+
+            if not is_on_ground or can_reach:
                 # 地面がない場合や、ブロックにぶつかって向こう岸にたどり着ける場合はジャンプ
                 self.speed_y = self.jump_power
                 self.is_on_ground = False
 
-    def draw(self):
-        pygame.draw.rect(self.surface, self.color, self.rect)
+    def draw(self, offset=(0, 0), alpha=1.0):
+        # alpha は前回の更新から今回の更新までの補間の割合 (1.0 なら今の位置)
+        return pygame.draw.rect(self.surface, self.color, self.rect.move(
+            offset[0] + round((self.prev_x - self.x) * (1.0 - alpha)),
+            offset[1] + round((self.prev_y - self.y) * (1.0 - alpha))))
 
-    def is_out_of_screen(self):
-        return self.y > settings.HEIGHT
+    def is_out_of_screen(self, world_height=settings.HEIGHT):
+        # マップの下端より下に落ちたかどうか
+        return self.y > world_height
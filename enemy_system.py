@@ -0,0 +1,191 @@
+import pygame
+import settings
+from enemy import Enemy
+from terrain import TILE_SOLID
+
+try:
+    import numpy as np
+except ImportError:  # numpy がない環境では Enemy のリストで動かす
+    np = None
+
+
+def _round_half_away(values):
+    # pygame.Rect の座標に小数を代入したときと同じ丸め方
+    return np.where(values >= 0, np.floor(values + 0.5), np.ceil(values - 0.5)).astype(np.int64)
+
+
+class EnemyView:
+    """EnemySystem 内の1体を Enemy と同じ属性で読み出すためのビュー"""
+
+    def __init__(self, system, index):
+        self.x = float(system.x[index])
+        self.y = float(system.y[index])
+        self.direction = int(system.direction[index])
+        self.rect = pygame.Rect(0, 0, system.width, system.height)
+        self.rect.x = self.x
+        self.rect.y = self.y
+
+
+class EnemySystem:
+    """敵全体の位置・速度・向き・接地状態を NumPy 配列で持ち、まとめて更新する
+
+    Enemy.update と同じ手順を配列演算で行うので、敵の動きは Enemy のリストを
+    使った場合と一致する。地形との接触は Map の地形全体から作った
+    マスごとの当たり判定の配列で判定する。
+    """
+
+    def __init__(self, surface):
+        if np is None:
+            raise ImportError("EnemySystem を使うには numpy が必要です")
+        self.surface = surface
+        template = Enemy(surface, 0, 0)
+        # 敵のパラメータはすべて Enemy と共通
+        self.template = template
+        self.width = template.width
+        self.height = template.height
+        self.speed_x = template.speed_x
+        self.gravity = template.gravity
+        self.jump_power = template.jump_power
+        self.color = template.color
+        if self.width > settings.GRID_SIZE or self.height > settings.GRID_SIZE:
+            raise ValueError("敵の大きさは1マス以下である必要があります")
+
+        self.x = np.zeros(0, dtype=np.float64)
+        self.y = np.zeros(0, dtype=np.float64)
+        self.speed_y = np.zeros(0, dtype=np.float64)
+        self.direction = np.ones(0, dtype=np.int64)
+        self.is_on_ground = np.zeros(0, dtype=bool)
+        # 1回前の更新時の位置 (描画の補間に使う)
+        self.prev_x = np.zeros(0, dtype=np.float64)
+        self.prev_y = np.zeros(0, dtype=np.float64)
+
+        self._terrain_revision = None
+        self._solid = None  # _solid[y, x] はそのマスに当たり判定のある地形があるか
+
+    def __len__(self):
+        return len(self.x)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield EnemyView(self, i)
+
+    def spawn(self, x, y):
+        self.x = np.append(self.x, float(x))
+        self.y = np.append(self.y, float(y))
+        self.speed_y = np.append(self.speed_y, 0.0)
+        self.direction = np.append(self.direction, 1)
+        self.is_on_ground = np.append(self.is_on_ground, False)
+        self.prev_x = np.append(self.prev_x, float(x))
+        self.prev_y = np.append(self.prev_y, float(y))
+
+    def rect_x(self):
+        return _round_half_away(self.x)
+
+    def rect_y(self):
+        return _round_half_away(self.y)
+
+    def update(self, map, player):
+        """全ての敵を1フレーム進め、プレイヤーに当たった数を返す
+
+        画面外に落ちた敵とプレイヤーに当たった敵は取り除く。
+        """
+        if len(self) == 0:
+            return 0
+        self._sync_map(map)
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+        # プレイヤーの方向を常に更新
+        self.direction = np.where(player.rect.x > self.x, 1, -1)
+        in_air = ~self.is_on_ground
+        on_ground = self.is_on_ground
+
+        # ジャンプ中: 横移動と重力による落下
+        self.x = np.where(in_air, self.x + self.speed_x * self.direction, self.x)
+        self.speed_y = np.where(in_air, self.speed_y + self.gravity, self.speed_y)
+        self.y = np.where(in_air, self.y + self.speed_y, self.y)
+
+        # ブロックに当たったら、一番上の行のブロックの上に乗る
+        landing_row = self._first_hit_row(self.rect_x(), self.rect_y())
+        landed = in_air & (landing_row >= 0)
+        self.y = np.where(
+            landed, landing_row * settings.GRID_SIZE - self.height, self.y)
+        self.speed_y = np.where(landed, 0.0, self.speed_y)
+
+        # 地上: 横移動し、ブロックにぶつかったら反対方向に移動
+        self.x = np.where(on_ground, self.x + self.speed_x * self.direction, self.x)
+        rect_y = self.rect_y()
+        is_blocked = on_ground & (self._first_hit_row(self.rect_x(), rect_y) >= 0)
+        self.direction = np.where(is_blocked, -self.direction, self.direction)
+        self.x = np.where(is_blocked, self.x + self.speed_x * self.direction, self.x)
+
+        # 地面との衝突判定（落下防止）
+        has_ground = self._first_hit_row(self.rect_x(), rect_y + 1) >= 0
+        can_reach = np.zeros(len(self), dtype=bool)
+        for i in np.flatnonzero(on_ground & has_ground & is_blocked):
+            self.template.x = float(self.x[i])
+            self.template.y = float(self.y[i])
+            can_reach[i] = self.template.can_reach_other_side(
+                map, int(self.direction[i]))
+        jump = on_ground & (~has_ground | can_reach)
+        self.speed_y = np.where(jump, self.jump_power, self.speed_y)
+        self.is_on_ground = (on_ground & ~jump) | landed
+
+        # 画面外の敵・プレイヤーに当たった敵を取り除く
+        rect_x = self.rect_x()
+        rect_y = self.rect_y()
+        is_out = self.y > map.pixel_height
+        is_hit = ~is_out & (
+            (rect_x < player.rect.right) & (player.rect.left < rect_x + self.width)
+            & (rect_y < player.rect.bottom) & (player.rect.top < rect_y + self.height))
+        self._keep(~(is_out | is_hit))
+        return int(np.count_nonzero(is_hit))
+
+    def draw(self, offset=(0, 0), alpha=1.0):
+        # alpha は前回の更新から今回の更新までの補間の割合 (1.0 なら今の位置)
+        draw_x = self.rect_x() + np.round((self.prev_x - self.x) * (1.0 - alpha)).astype(np.int64)
+        draw_y = self.rect_y() + np.round((self.prev_y - self.y) * (1.0 - alpha)).astype(np.int64)
+        return [
+            pygame.draw.rect(
+                self.surface, self.color,
+                (rect_x + offset[0], rect_y + offset[1], self.width, self.height))
+            for rect_x, rect_y in zip(draw_x.tolist(), draw_y.tolist())
+        ]
+
+    def _keep(self, mask):
+        self.x = self.x[mask]
+        self.y = self.y[mask]
+        self.speed_y = self.speed_y[mask]
+        self.direction = self.direction[mask]
+        self.is_on_ground = self.is_on_ground[mask]
+        self.prev_x = self.prev_x[mask]
+        self.prev_y = self.prev_y[mask]
+
+    def _sync_map(self, map):
+        # 地形が変わったときだけ作り直す
+        if self._terrain_revision == map.terrain_revision:
+            return
+        self._terrain_revision = map.terrain_revision
+        tiles = np.frombuffer(map.tiles, dtype=np.uint8).reshape(map.height, map.width)
+        self._solid = np.frombuffer(TILE_SOLID, dtype=bool)[tiles]
+
+    def _first_hit_row(self, rect_x, rect_y):
+        """Map.tiles_overlapping と同じ範囲で、地形がある一番上の行を返す (なければ -1)"""
+        result = np.full(len(rect_x), -1, dtype=np.int64)
+        rows, cols = self._solid.shape
+        if rows == 0 or cols == 0:
+            return result
+        left = np.maximum(rect_x // settings.GRID_SIZE, 0)
+        right = np.minimum((rect_x + self.width - 1) // settings.GRID_SIZE, cols - 1)
+        top = np.maximum(rect_y // settings.GRID_SIZE, 0)
+        bottom = np.minimum((rect_y + self.height - 1) // settings.GRID_SIZE, rows - 1)
+
+        # 敵は1マス以下の大きさなので、調べるのは top, top + 1 行 × left, left + 1 列だけ
+        for row in (top + 1, top):
+            safe_row = np.clip(row, 0, rows - 1)
+            is_hit = np.zeros(len(rect_x), dtype=bool)
+            for col in (left, left + 1):
+                valid = (row <= bottom) & (col <= right)
+                is_hit |= valid & self._solid[safe_row, np.clip(col, 0, cols - 1)]
+            result = np.where(is_hit, row, result)
+        return result
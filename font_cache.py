@@ -0,0 +1,80 @@
+import os
+from collections import OrderedDict
+import pygame
+import settings
+
+
+class FontCache:
+    """プロセス全体で共有するフォントと描画済みテキストのキャッシュ
+
+    フォントは (ファイル, サイズ) ごとに一度だけ読み込む。
+    描画済みのテキストは (ファイル, サイズ, テキスト, 色, アンチエイリアス) をキーに
+    settings.TEXT_CACHE_SIZE 個まで保持し、古いものから捨てる。
+    返す Surface は共有されるため、呼び出し側で変更しないこと。
+    """
+
+    _fonts = {}
+    _texts = OrderedDict()
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get_font(cls, size, font_file=settings.FONT_FILE_NAME):
+        """フォントを取得する (読み込めない場合は日本語のシステムフォントで代用する)"""
+        key = (font_file, size)
+        font = cls._fonts.get(key)
+        if font is None:
+            font = cls._load_font(font_file, size)
+            cls._fonts[key] = font
+        return font
+
+    @classmethod
+    def render(cls, text, size, color, antialias=True, font_file=settings.FONT_FILE_NAME):
+        """テキストを描画した Surface を取得する"""
+        key = (font_file, size, text, tuple(color), antialias)
+        surface = cls._texts.get(key)
+        if surface is not None:
+            cls.hits += 1
+            cls._texts.move_to_end(key)
+            return surface
+
+        cls.misses += 1
+        surface = cls.get_font(size, font_file).render(text, antialias, color)
+        cls._texts[key] = surface
+        if len(cls._texts) > settings.TEXT_CACHE_SIZE:
+            cls._texts.popitem(last=False)
+        return surface
+
+    @classmethod
+    def clear(cls):
+        cls._fonts.clear()
+        cls._texts.clear()
+
+    @classmethod
+    def stats(cls):
+        """キャッシュのヒット数・ミス数・保持しているフォントとテキストの数を返す"""
+        return {
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "fonts": len(cls._fonts),
+            "texts": len(cls._texts),
+        }
+
+    @staticmethod
+    def _load_font(font_file, size):
+        font_path = os.path.join(os.path.dirname(__file__), font_file)
+        if os.path.exists(font_path):
+            try:
+                return pygame.font.Font(font_path, size)
+            except Exception as e:
+                print(f"フォント読み込みエラー: {e}")
+        else:
+            print(f"フォントファイルが見つかりません: {font_path}")
+
+        # 日本語を表示できそうなシステムフォントで代用する
+        for font_name in ['msgothic', 'meiryo', 'yu gothic', 'hiragino kaku gothic']:
+            try:
+                return pygame.font.SysFont(font_name, size)
+            except Exception:
+                pass
+        return pygame.font.SysFont(None, size)
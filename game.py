@@ -1,64 +1,253 @@
+import random
+import time
 import pygame
 import settings
 from stage import Stage
+from stage_cache import StageCache
+from assets import AssetLoader
 from title_screen import TitleScreen
 import pygame_music_materials as pmm
-from sound_manager import SoundManager
+from sound_manager import SoundManager, NullSoundManager
+from dirty_renderer import DirtyRectRenderer
+from quality import QualityGovernor
+from headless import use_dummy_drivers, NullMixer, InputState
+from profiler import profiler
+from replay import INPUT_KEYS, decode_keys, stage_checksum
 
 
 class Game:
-    def __init__(self):
-        pygame.init()
-        self.surface = pygame.display.set_mode(
-            (settings.WIDTH, settings.HEIGHT))
+    def __init__(self, headless=False, seed=None, stage_index=0):
+        self.headless = headless
+        if self.headless:
+            use_dummy_drivers()
+        # 画像・効果音はスレッドで読み込み、その間もタイトル画面を表示する
+        self.assets = AssetLoader()
+        with self.assets.phase("pygame.init"):
+            pygame.init()
+        with self.assets.phase("display"):
+            self.surface = pygame.display.set_mode(
+                (settings.WIDTH, settings.HEIGHT))
         self.clock = pygame.time.Clock()
+        self.render_fps = settings.FPS  # 描画の上限 (ゲームの進む速さには影響しない)
+        # 変化した範囲だけを描き直す (デバッグ表示は毎フレーム画面全体に描くので使わない)
+        self.renderer = None
+        if settings.USE_DIRTY_RECTS and not settings.IS_DEBUG_MODE:
+            self.renderer = DirtyRectRenderer(self.surface)
+        # フレーム時間に応じて描画の効果や敵の量を調整する
+        self.governor = None
+        if settings.USE_QUALITY_GOVERNOR:
+            self.governor = QualityGovernor(self.render_fps)
         pygame.display.set_caption(settings.TITLE)
-        self.stage_state_number = 0
+        self.stage_state_number = stage_index
         self.stage = None
         self.is_title_screen = True
-        self.title_screen = TitleScreen(self.surface)
+        with self.assets.phase("title_screen"):
+            self.title_screen = TitleScreen(self.surface)
+        self.is_first_frame = True
 
-        # 音楽の初期化
-        self.mixer = pmm.Mixer()
-        self.mixer.set_volume(1.0)
-        self.mixer.play(pmm.night)  # タイトル画面の音楽を再生
+        # 各ステージのシードはゲーム全体のシードから順に決める
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.rng = random.Random(self.seed)
+        # ステージへのキー入力はすべて input_state を経由する (記録・再生のため)
+        self.input_state = InputState()
+        self.recorder = None  # Replay を設定すると入力を記録する
 
-        # 効果音の初期化
-        self.sound_manager = SoundManager()
-        self.sound_manager.set_volume(0.7)  # 効果音のボリュームを設定
+        if self.headless:
+            # 音を鳴らさない
+            self.mixer = NullMixer()
+            self.sound_manager = NullSoundManager()
+        else:
+            with self.assets.phase("mixer"):
+                # 音楽の初期化
+                self.mixer = pmm.Mixer()
+                self.mixer.set_volume(1.0)
+                self.mixer.play(pmm.night)  # タイトル画面の音楽を再生
 
-        self.stage_init()
+                # 効果音の初期化 (効果音のデコードは AssetLoader で行う)
+                self.sound_manager = SoundManager(load=False)
+                self.sound_manager.set_volume(0.7)  # 効果音のボリュームを設定
+
+        self.assets.start(load_sounds=not self.headless)
+        StageCache.prefetch(settings.STAGE_FILE_NAMES[self.stage_state_number])
+        if self.headless:
+            # ヘッドレス実行ではタイトル画面がないので、すぐに読み込みを終える
+            self.finish_loading()
+
+    def finish_loading(self):
+        """読み込んだアセットを登録し、最初のステージを作る (読み込み中なら待つ)"""
+        if self.stage is not None:
+            return
+        self.assets.install(self.sound_manager)
+        with self.assets.phase("stage_init"):
+            self.stage_init()
+        self.assets.mark("ready")
+
+    def startup_report(self):
+        """起動時間の内訳を文字列のリストで返す"""
+        return self.assets.report()
 
     def stage_init(self):
-        self.stage = Stage(
-            self.surface, settings.STAGE_FILE_NAMES[self.stage_state_number], self.mixer, self.sound_manager)
+        stage_file_name = settings.STAGE_FILE_NAMES[self.stage_state_number]
+        seed = self.rng.getrandbits(32)
+        if self.stage is None:
+            self.stage = Stage(
+                self.surface, stage_file_name, self.mixer, self.sound_manager,
+                self.input_state, seed)
+        else:
+            # Stage (背景・UI など) は使い回し、ステージの中身だけ入れ替える
+            self.stage.load(stage_file_name, seed)
 
     def __del__(self):
         pygame.quit()
 
     def run(self):
+        """ゲームを固定間隔 (settings.SIMULATION_FPS) で進め、描画はできる速さで行う
+
+        描画が遅れた分は1回の描画の間に複数回更新して追いつき (最大
+        settings.MAX_SIMULATION_STEPS 回)、更新の間の時間は位置を補間して描画する。
+        """
+        step_time = 1.0 / settings.SIMULATION_FPS
+        accumulator = 0.0  # まだゲームを進めていない経過時間
+        last_time = time.perf_counter()
+        if self.governor is not None:
+            self.governor.set_fps(self.render_fps)
+            # 入力を記録している間は、再生したときと進み方が変わらないようにする
+            self.governor.allow_gameplay_changes = self.recorder is None
         while True:
-            self.clock.tick(settings.FPS)
+            self.clock.tick(self.render_fps)
+            now = time.perf_counter()
+            accumulator += now - last_time
+            last_time = now
+            profiler.begin_frame()
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     return
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_SPACE:
-                    if self.is_title_screen:
+                    # 読み込みが終わるまではステージを始められない
+                    if self.is_title_screen and self.stage is not None:
                         self.is_title_screen = False
                         self.mixer.play(pmm.field)  # ステージBGMに切り替え
 
-            self.surface.fill(settings.COLORS["black"])
+            if self.stage is None and self.assets.is_done():
+                self.finish_loading()
 
+            dirty_rects = None  # None なら画面全体を更新する
             if self.is_title_screen:
-                self.title_screen.draw()
+                accumulator = 0.0
+                self.surface.fill(settings.COLORS["black"])
+                # 読み込み中は進み具合を表示する
+                self.title_screen.draw(
+                    None if self.stage is not None else self.assets.progress())
+                if self.renderer is not None:
+                    self.renderer.invalidate()
             else:
-                self.stage.update()
-                self.stage.draw()
-                self.check_stage_clear()
+                key = pygame.key.get_pressed()
+                self.input_state.set(
+                    key_code for key_code in INPUT_KEYS if key[key_code])
+                steps = 0
+                while accumulator >= step_time and not self.is_title_screen:
+                    if steps >= settings.MAX_SIMULATION_STEPS:
+                        # 追いつけない分は捨てる (その間はゲームがゆっくり進む)
+                        accumulator = 0.0
+                        break
+                    self.stage.update()
+                    if self.recorder is not None:
+                        self.recorder.record(key, self.stage)
+                    self.check_stage_clear()
+                    accumulator -= step_time
+                    steps += 1
+                alpha = min(accumulator / step_time, 1.0)
+                if self.governor is not None:
+                    self.governor.apply(self.stage)
+                if self.renderer is not None:
+                    dirty_rects = self.renderer.draw(self.stage, alpha)
+                else:
+                    self.surface.fill(settings.COLORS["black"])
+                    self.stage.draw(alpha)
+
+            if settings.IS_DEBUG_MODE:
+                profiler.draw(self.surface, [self.governor.describe()] if self.governor else [])
+            with profiler.section("display.update"):
+                if dirty_rects is None:
+                    pygame.display.update()
+                else:
+                    pygame.display.update(dirty_rects)
+            if self.is_first_frame:
+                self.is_first_frame = False
+                self.assets.mark("first_frame")
+            if self.governor is not None and not self.is_title_screen:
+                self.governor.record(time.perf_counter() - now)
+            profiler.end_frame()
+
+    def run_headless(self, frames):
+        """描画・音声・フレーム待ちなしで Stage.update を frames 回進める"""
+        self.finish_loading()
+        self.is_title_screen = False
+        stages_cleared = 0
+        start = time.perf_counter()
+        for _ in range(frames):
+            profiler.begin_frame()
+            self.stage.update()
+            if self.stage.is_clear:
+                stages_cleared += 1
+            self.check_stage_clear()
+            profiler.end_frame()
+        elapsed = time.perf_counter() - start
+        return {
+            "frames": frames,
+            "seconds": elapsed,
+            "fps": frames / elapsed if elapsed > 0 else float("inf"),
+            "stages_cleared": stages_cleared,
+            "stage": self.stage.stage_file_name,
+            "hp": self.stage.player.hp,
+            "chunks": self.stage.map.loader.stats.summary(),
+        }
 
-            pygame.display.update()
+    def run_replay(self, replay, render=False, uncapped=True):
+        """記録した入力でステージを進め直す
+
+        Game は replay.seed と replay.stage_index で作成しておくこと。
+        記録時と同じ状態をたどったかどうかをチェックサムで確認する。
+        """
+        self.finish_loading()
+        self.is_title_screen = False
+        checksum = 0
+        start = time.perf_counter()
+        for mask in replay.inputs:
+            profiler.begin_frame()
+            if render:
+                if not uncapped:
+                    self.clock.tick(settings.FPS)
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        return None
+            self.input_state.set(decode_keys(mask))
+            self.stage.update()
+            checksum = stage_checksum(self.stage, checksum)
+            if render:
+                self.surface.fill(settings.COLORS["black"])
+                self.stage.draw()
+                with profiler.section("display.update"):
+                    pygame.display.update()
+            self.check_stage_clear()
+            profiler.end_frame()
+        elapsed = time.perf_counter() - start
+        return {
+            "frames": len(replay),
+            "seconds": elapsed,
+            "fps": len(replay) / elapsed if elapsed > 0 else float("inf"),
+            "stage": self.stage.stage_file_name,
+            "hp": self.stage.player.hp,
+            "chunks": self.stage.map.loader.stats.summary(),
+            "checksum": checksum,
+            "matches": checksum == replay.checksum,
+        }
 
     def check_stage_clear(self):
+        if self.stage.is_clearing:
+            # クリア演出の間に次のステージを読み込んでおく
+            next_index = (self.stage_state_number + 1) % len(settings.STAGE_FILE_NAMES)
+            StageCache.prefetch(settings.STAGE_FILE_NAMES[next_index])
         if self.stage.is_clear:
             self.stage_state_number += 1
             if self.stage_state_number >= len(settings.STAGE_FILE_NAMES):
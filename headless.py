@@ -0,0 +1,37 @@
+import os
+
+
+def use_dummy_drivers():
+    """画面・音声デバイスを使わない SDL ドライバを指定する (pygame.init より前に呼ぶ)"""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+
+class NullMixer:
+    """BGM を鳴らさない Mixer (ヘッドレス実行用)"""
+
+    def play(self, music):
+        pass
+
+    def set_volume(self, volume):
+        pass
+
+
+class InputState:
+    """外部から注入するキー入力
+
+    pygame.key.get_pressed() の戻り値と同じく、キー定数で添字アクセスできる。
+    Player の get_pressed にはこのインスタンス自身を渡す。
+    """
+
+    def __init__(self, pressed_keys=()):
+        self.pressed_keys = set(pressed_keys)
+
+    def __call__(self):
+        return self
+
+    def __getitem__(self, key):
+        return key in self.pressed_keys
+
+    def set(self, pressed_keys):
+        self.pressed_keys = set(pressed_keys)
@@ -1,6 +1,86 @@
+import argparse
 from game import Game
+from profiler import profiler
+from replay import Replay
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="くらりのプラットフォーマー")
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="画面・音声なしでステージを最高速度で進める")
+    parser.add_argument(
+        "--frames", type=int, default=3600,
+        help="ヘッドレス実行で進めるフレーム数")
+    parser.add_argument(
+        "--seed", type=int, default=None,
+        help="敵の出現に使う乱数のシード")
+    parser.add_argument(
+        "--record", metavar="FILE",
+        help="プレイ中の入力をリプレイファイルに記録する")
+    parser.add_argument(
+        "--replay", metavar="FILE",
+        help="リプレイファイルを再生する (--headless なら描画なし)")
+    parser.add_argument(
+        "--uncapped", action="store_true",
+        help="リプレイを描画する場合もFPS制限をかけない")
+    parser.add_argument(
+        "--fps", type=int, default=None,
+        help="描画の上限FPS (ゲームの進む速さは変わらない)")
+    parser.add_argument(
+        "--profile", metavar="FILE",
+        help="フレームごとの処理時間を CSV (.json なら JSON) に書き出す")
+    parser.add_argument(
+        "--startup-report", action="store_true",
+        help="起動時間 (アセットの読み込みなど) の内訳を表示する")
+    return parser.parse_args()
+
+
+def print_result(result):
+    print(
+        f"{result['frames']} frames in {result['seconds']:.3f}s "
+        f"({result['fps']:.0f} fps), stage: {result['stage']}, "
+        f"hp: {result['hp']}")
+    chunks = result["chunks"]
+    print(
+        f"chunks: stalls {chunks['stalls']} "
+        f"({chunks['stall_ms']:.1f}ms total, {chunks['max_stall_ms']:.1f}ms max), "
+        f"prefetch misses {chunks['misses']}/{chunks['hits'] + chunks['misses']}, "
+        f"evictions {chunks['evictions']}")
 
 
 if __name__ == "__main__":
-    game = Game()
-    game.run()
+    args = parse_args()
+    if args.profile:
+        profiler.enable_history()
+    if args.replay:
+        replay = Replay.load(args.replay)
+        game = Game(headless=args.headless, seed=replay.seed,
+                    stage_index=replay.stage_index)
+        result = game.run_replay(
+            replay, render=not args.headless, uncapped=args.uncapped)
+        if result is not None:
+            print_result(result)
+            print("checksum: " + ("一致" if result["matches"] else "不一致"))
+    elif args.headless:
+        game = Game(headless=True, seed=args.seed)
+        result = game.run_headless(args.frames)
+        print_result(result)
+        print(f"cleared: {result['stages_cleared']}")
+    else:
+        game = Game(seed=args.seed)
+        if args.fps:
+            game.render_fps = args.fps
+        if args.record:
+            game.recorder = Replay(game.seed)
+        game.run()
+        if args.record:
+            game.recorder.save(args.record)
+            print(f"リプレイを保存しました: {args.record} ({len(game.recorder)} frames)")
+    if args.startup_report:
+        print("startup:")
+        for line in game.startup_report():
+            print(f"  {line}")
+    if args.profile:
+        profiler.dump(args.profile)
+        print(f"プロファイルを保存しました: {args.profile}")
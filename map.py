@@ -1,34 +1,275 @@
-import json
-import os
-from terrain import Terrain
+import pygame
+import settings
+from chunk_loader import ChunkLoader
+from stage_cache import StageCache
+from stage_format import occupied_chunks
+from terrain import Tile, TILE_SOLID
+from tile_layer import TileLayer
+
+ACTIVE_CHUNK_MARGIN = 1  # 画面の外側に何チャンク分を読み込んでおくか
+PREFETCH_CHUNK_MARGIN = 2  # さらにその外側に何チャンク分を先読みしておくか
 
 
 class Map:
-    def __init__(self, surface):
-        self.map_data = []
-        self.map_objects = []
+    def __init__(self, surface, render=True):
+        """render が False なら描画用のレイヤーを作らない (初めて draw したときに作る)"""
+        self.stage = None  # StageCache の (ステージ名, 幅, 高さ, 地形番号)
+        self.map_name = ""
         self.surface = surface
+        # マップの大きさ (マス数)
+        self.width = 0
+        self.height = 0
+        # 地形番号 (1マス1バイト、行優先で width * height 個)
+        # 地形の性質は terrain の TILE_* の表を地形番号で引く
+        self.tiles = bytearray()
+        self._initial_tiles = b""  # 読み込んだ時点の地形 (リセット用)
+        self.chunk_keys = set()  # 地形のあるチャンク (chunk_x, chunk_y)
+        self._initial_chunk_keys = frozenset()
+        # 画面付近のチャンクだけを描画に使う (当たり判定は self.tiles 全体で行う)
+        self.active_chunks = set()
+        # 当たり判定で返した Tile (grid_y * width + grid_x -> Tile)
+        self._tile_objects = {}
+        self._active_range = None
+        # 地形を焼き込んだ描画レイヤー (読み込み中のチャンクのみ)
+        self.tile_layer = None
+        # チャンクの作成をワーカースレッドで先に済ませておく
+        self.loader = None
+        self.edited_chunks = set()  # set_tile で書き換えたチャンク
+        # 敵のジャンプ到達判定の結果 ((x, y, direction) -> bool)
+        # 地形が変わったら破棄する
+        self.reachability = {}
+        # 地形か描画するチャンクが変わるたびに増える番号 (描画の作り直しの判定に使う)
+        self.revision = 0
+        # 地形が変わるたびに増える番号 (地形から作った当たり判定のデータの作り直しの判定に使う)
+        self.terrain_revision = 0
+        if render:
+            self.enable_rendering()
+
+    @property
+    def is_rendering(self):
+        return self.tile_layer is not None
+
+    def enable_rendering(self):
+        """描画用のレイヤーとチャンクの読み込みを用意する (次の update_active_chunks から読み込む)"""
+        if self.tile_layer is not None:
+            return
+        self.tile_layer = TileLayer()
+        self.loader = ChunkLoader(self.tile_layer)
+        self._active_range = None
+
+    @property
+    def pixel_width(self):
+        return self.width * settings.GRID_SIZE
+
+    @property
+    def pixel_height(self):
+        return self.height * settings.GRID_SIZE
+
+    @property
+    def map_objects(self):
+        """読み込み中のチャンクにある地形の Tile の一覧 (デバッグ表示用)"""
+        objects = []
+        for chunk_x, chunk_y in self.active_chunks:
+            for grid_y in range(chunk_y * settings.CHUNK_SIZE,
+                                min((chunk_y + 1) * settings.CHUNK_SIZE, self.height)):
+                for grid_x in range(chunk_x * settings.CHUNK_SIZE,
+                                    min((chunk_x + 1) * settings.CHUNK_SIZE, self.width)):
+                    tile = self._tile_object(grid_x, grid_y)
+                    if tile is not None:
+                        objects.append(tile)
+        return objects
 
     def update(self):
         pass
 
-    def draw(self):
-        for obj in self.map_objects:
-            obj.draw()
+    def draw(self, offset=(0, 0)):
+        if self.tile_layer is None:
+            # 描画なしで作ったマップを初めて描画する
+            self.enable_rendering()
+            self.update_active_chunks(pygame.Rect(
+                -offset[0], -offset[1], settings.WIDTH, settings.HEIGHT))
+        self.tile_layer.draw(self.surface, offset)
+        if settings.IS_DEBUG_MODE:
+            for obj in self.map_objects:
+                pygame.draw.rect(
+                    self.surface, settings.COLORS["blue"], obj.rect.move(offset), 2)
 
     def load_map(self, filename):
-        base_path = os.path.dirname(__file__)
-        file_path = os.path.join(base_path, "maps", filename)
-        with open(file_path, "r") as f:
-            self.map_data = json.load(f)
-        self._make_objects()
-
-    def _make_objects(self):
-        for y, row in enumerate(self.map_data["map_data"]):
-            for x, cell in enumerate(row):
-                if cell == 0:  # 0は何もないタイル
+        """ステージを読み込む (ファイルの読み込みは StageCache で一度だけ行う)
+
+        同じステージを読み込み直す場合 (やられたときのリセット) は、
+        作成済みのチャンクをそのまま使い回す。
+        """
+        self.load_stage(StageCache.get(filename))
+
+    def load_stage(self, stage):
+        """(ステージ名, 幅, 高さ, 地形番号) のステージを読み込む"""
+        is_same_stage = stage is self.stage
+        self.stage = stage
+        self._make_objects(keep_loaded=is_same_stage)
+
+    def _make_objects(self, keep_loaded=False):
+        """self.stage から地形データを作る
+
+        keep_loaded が True なら、同じステージの読み込み直しなので、読み込んだ時点の
+        地形をコピーするだけにし、ChunkLoader の作成済みのチャンクも捨てずに使う。
+        """
+        if not keep_loaded:
+            self._read_tiles()
+        self.tiles = bytearray(self._initial_tiles)
+        self.chunk_keys = set(self._initial_chunk_keys)
+        self._tile_objects = {}
+
+        self.active_chunks = set()
+        self._active_range = None
+        if self.loader is not None:
+            self.tile_layer.clear()
+            if keep_loaded:
+                # 書き換えたチャンクは読み込み直した内容と違うので作り直す
+                for key in self.edited_chunks:
+                    self.loader.invalidate(key)
+            else:
+                self.loader.clear()
+        self.edited_chunks = set()
+        self._terrain_changed()
+        # カメラが決まるまでは画面左上の範囲を読み込んでおく
+        self.update_active_chunks(
+            pygame.Rect(0, 0, settings.WIDTH, settings.HEIGHT))
+
+    def _read_tiles(self):
+        # 地形番号は StageCache の bytes をそのまま使う (書き換えるのは self.tiles のコピー)
+        self.map_name, self.width, self.height, self._initial_tiles = self.stage
+        self._initial_chunk_keys = frozenset(
+            occupied_chunks(self.width, self.height, self._initial_tiles))
+
+    def chunk_rows(self, key):
+        """チャンクの地形番号を CHUNK_SIZE 四方の2次元リストで返す (マップの外は 0)"""
+        base_x = key[0] * settings.CHUNK_SIZE
+        base_y = key[1] * settings.CHUNK_SIZE
+        count = max(min(settings.CHUNK_SIZE, self.width - base_x), 0)
+        padding = [0] * (settings.CHUNK_SIZE - count)
+        rows = []
+        for grid_y in range(base_y, base_y + settings.CHUNK_SIZE):
+            if grid_y < self.height:
+                start = grid_y * self.width + base_x
+                rows.append(list(self.tiles[start:start + count]) + padding)
+            else:
+                rows.append([0] * settings.CHUNK_SIZE)
+        return rows
+
+    def update_active_chunks(self, view_rect):
+        """view_rect (ワールド座標) 付近のチャンクを描画用に読み込み、離れたチャンクを手放す"""
+        if self.loader is None:
+            return
+        self.loader.poll()
+        chunk_pixels = settings.CHUNK_SIZE * settings.GRID_SIZE
+        active_range = (
+            max(view_rect.left // chunk_pixels - ACTIVE_CHUNK_MARGIN, 0),
+            (view_rect.right - 1) // chunk_pixels + ACTIVE_CHUNK_MARGIN,
+            max(view_rect.top // chunk_pixels - ACTIVE_CHUNK_MARGIN, 0),
+            (view_rect.bottom - 1) // chunk_pixels + ACTIVE_CHUNK_MARGIN,
+        )
+        if active_range == self._active_range:
+            return
+        # 読み込み直後は先読みのしようがないので、統計には数えない
+        is_initial = self._active_range is None
+        self._active_range = active_range
+        left, right, top, bottom = active_range
+
+        for key in list(self.active_chunks):
+            if not (left <= key[0] <= right and top <= key[1] <= bottom):
+                self._deactivate_chunk(key)
+        for chunk_y in range(top, bottom + 1):
+            for chunk_x in range(left, right + 1):
+                key = (chunk_x, chunk_y)
+                if key not in self.active_chunks and key in self.chunk_keys:
+                    self._activate_chunk(key, is_initial)
+
+        # カメラが近づく前に周りのチャンクを作っておく
+        for chunk_y in range(max(top - PREFETCH_CHUNK_MARGIN, 0),
+                             bottom + PREFETCH_CHUNK_MARGIN + 1):
+            for chunk_x in range(max(left - PREFETCH_CHUNK_MARGIN, 0),
+                                 right + PREFETCH_CHUNK_MARGIN + 1):
+                key = (chunk_x, chunk_y)
+                if (key not in self.active_chunks and key in self.chunk_keys
+                        and not self.loader.has(key)):
+                    self.loader.request(key, self.chunk_rows(key))
+        self.loader.evict(
+            self.active_chunks, ((left + right) // 2, (top + bottom) // 2))
+
+    def _activate_chunk(self, key, is_initial=False):
+        chunk = self.loader.take(key, self.chunk_rows, count_stats=not is_initial)
+        self.active_chunks.add(key)
+        self.tile_layer.set_chunk(key, chunk.image)
+        self.revision += 1  # 描画だけが変わる (当たり判定の地形はそのまま)
+
+    def _deactivate_chunk(self, key):
+        self.active_chunks.discard(key)
+        self.tile_layer.drop_chunk(key)
+        self.revision += 1
+
+    def _terrain_changed(self):
+        # 当たり判定に使う地形が変わったので、地形から作ったデータを破棄する
+        self.reachability = {}
+        self.revision += 1
+        self.terrain_revision += 1
+
+    def get_tile(self, grid_x, grid_y):
+        """マスの地形番号を返す (範囲外・何もないマスは 0)"""
+        if not (0 <= grid_x < self.width and 0 <= grid_y < self.height):
+            return 0
+        return self.tiles[grid_y * self.width + grid_x]
+
+    def set_tile(self, grid_x, grid_y, terrain_color):
+        """1マスの地形を変更し、当たり判定と描画レイヤーを更新する"""
+        if not (0 <= grid_x < self.width and 0 <= grid_y < self.height):
+            return
+        key = (grid_x // settings.CHUNK_SIZE, grid_y // settings.CHUNK_SIZE)
+        index = grid_y * self.width + grid_x
+        self.tiles[index] = terrain_color
+        self._tile_objects.pop(index, None)
+        self.chunk_keys.add(key)
+        self.edited_chunks.add(key)
+
+        if key in self.active_chunks:
+            self.tile_layer.set_tile(grid_x, grid_y, terrain_color)
+        elif self.loader is not None:
+            # 作成済みのものは古いので捨て、読み込み範囲内なら次の更新で読み込む
+            self.loader.invalidate(key)
+            self._active_range = None
+        self._terrain_changed()
+
+    def _tile_object(self, grid_x, grid_y):
+        # 当たり判定に使う地形のマスの Tile を返す (初めて必要になったときに作る)
+        index = grid_y * self.width + grid_x
+        tile = self._tile_objects.get(index)
+        if tile is None:
+            terrain_color = self.tiles[index]
+            if not TILE_SOLID[terrain_color]:
+                return None
+            tile = Tile(grid_x, grid_y, terrain_color)
+            self._tile_objects[index] = tile
+        return tile
+
+    def tiles_overlapping(self, rect):
+        """rect と重なる地形を行優先の順序で返す
+
+        rect が覆うマスだけを調べるので、コストはマップ全体のタイル数ではなく
+        rect の大きさに比例する。画面から離れた (描画用に読み込まれていない)
+        チャンクの地形も返す。
+        """
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        left = max(rect.left // settings.GRID_SIZE, 0)
+        right = min((rect.right - 1) // settings.GRID_SIZE, self.width - 1)
+        top = max(rect.top // settings.GRID_SIZE, 0)
+        bottom = min((rect.bottom - 1) // settings.GRID_SIZE, self.height - 1)
+
+        tiles = []
+        for grid_y in range(top, bottom + 1):
+            row_start = grid_y * self.width
+            for grid_x in range(left, right + 1):
+                if not TILE_SOLID[self.tiles[row_start + grid_x]]:
                     continue
-                terrain = Terrain(
-                    self.surface, x, y, cell
-                )
-                self.map_objects.append(terrain)
+                tiles.append(self._tile_object(grid_x, grid_y))
+        return tiles
@@ -3,6 +3,17 @@ import settings
 import os
 import json
 from terrain import Terrain
+from tile_layer import TileLayer
+from font_cache import FontCache
+from stage_format import BINARY_EXTENSION, is_binary_stage, read_stage_rows, write_stage
+
+
+def _read_map_file(filepath):
+    """JSON・バイナリ形式のどちらのマップも {"map_name", "map_data"} 形式で読み込む"""
+    if is_binary_stage(filepath):
+        return read_stage_rows(filepath)
+    with open(filepath, "r") as f:
+        return json.load(f)
 
 
 class FontManager:
@@ -12,32 +23,13 @@ class FontManager:
 
     @classmethod
     def get_font(cls, size):
-        """Get a Japanese font of the specified size"""
-        base_path = os.path.dirname(__file__)
-        font_path = os.path.join(base_path, cls.FONT_FILE)
-
-        if os.path.exists(font_path):
-            try:
-                return pygame.font.Font(font_path, size)
-            except Exception as e:
-                print(f"フォント読み込みエラー: {e}")
-        else:
-            print(f"フォントファイルが見つかりません: {font_path}")
+        """Get a Japanese font of the specified size (shared via FontCache)"""
+        return FontCache.get_font(size, cls.FONT_FILE)
 
-        # Fallbacks if the font file couldn't be loaded
-        try:
-            # Try some common Japanese fonts
-            for font_name in ['msgothic', 'meiryo', 'yu gothic', 'hiragino kaku gothic']:
-                try:
-                    return pygame.font.SysFont(font_name, size)
-                except Exception:
-                    pass
-
-            # Last resort: default font
-            return pygame.font.SysFont(None, size)
-        except Exception as e:
-            print(f"フォント読み込みエラー: {e}")
-            return pygame.font.SysFont(None, size)
+    @classmethod
+    def render(cls, text, size, color):
+        """Render text with a Japanese font, reusing cached surfaces"""
+        return FontCache.render(text, size, color, font_file=cls.FONT_FILE)
 
 
 class Notification:
@@ -46,7 +38,7 @@ class Notification:
     def __init__(self, surface):
         self.surface = surface
         self.messages = []  # List of (message, creation_time, duration, color)
-        self.font = FontManager.get_font(18)
+        self.font_size = 18
         self.padding = 10
         self.default_duration = 3000  # milliseconds
         self.fade_time = 500  # milliseconds to fade out
@@ -87,8 +79,8 @@ class Notification:
                 opacity = int(255 * remaining / self.fade_time)
 
             # Calculate Y position (stack notifications from bottom up)
-            rendered_text = self.font.render(
-                message["text"], True, message["color"])
+            rendered_text = FontManager.render(
+                message["text"], self.font_size, message["color"])
             text_width = min(rendered_text.get_width(), self.max_width)
             text_height = rendered_text.get_height()
 
@@ -128,8 +120,8 @@ class MapSelectionUI:
     def __init__(self, surface):
         self.surface = surface
         # Use local Japanese font
-        self.font = FontManager.get_font(24)
-        self.small_font = FontManager.get_font(18)
+        self.font_size = 24
+        self.small_font_size = 18
         self.maps = self._load_map_list()
         self.selected_index = 0
         self.running = True
@@ -152,16 +144,15 @@ class MapSelectionUI:
                                   color=settings.COLORS["green"])
 
         for filename in os.listdir(maps_dir):
-            if filename.endswith('.json'):
+            if filename.endswith('.json') or is_binary_stage(filename):
                 file_path = os.path.join(maps_dir, filename)
                 try:
-                    with open(file_path, 'r') as f:
-                        map_data = json.load(f)
-                        maps.append({
-                            "filename": filename,
-                            "map_name": map_data.get("map_name", "名前なし"),
-                            "filepath": file_path
-                        })
+                    map_data = _read_map_file(file_path)
+                    maps.append({
+                        "filename": filename,
+                        "map_name": map_data.get("map_name", "名前なし"),
+                        "filepath": file_path
+                    })
                 except Exception as e:
                     error_msg = f"マップ読み込みエラー: {filename}"
                     print(f"{error_msg}: {e}")
@@ -211,14 +202,14 @@ class MapSelectionUI:
         self.surface.fill(settings.COLORS["black"])
 
         # Draw title
-        title = self.font.render(
-            "マップエディター - マップ選択", True, settings.COLORS["white"])
+        title = FontManager.render(
+            "マップエディター - マップ選択", self.font_size, settings.COLORS["white"])
         self.surface.blit(
             title, (settings.WIDTH // 2 - title.get_width() // 2, 50))
 
         # Draw instructions
-        instructions = self.small_font.render(
-            self.instruction_text, True, settings.COLORS["white"])
+        instructions = FontManager.render(
+            self.instruction_text, self.small_font_size, settings.COLORS["white"])
         self.surface.blit(instructions, (settings.WIDTH //
                           2 - instructions.get_width() // 2, 100))
 
@@ -245,14 +236,14 @@ class MapSelectionUI:
             text_color = settings.COLORS["yellow"] if i == self.selected_index else settings.COLORS["white"]
 
             # Map name text
-            text = self.font.render(
-                map_info["map_name"], True, text_color)
+            text = FontManager.render(
+                map_info["map_name"], self.font_size, text_color)
             self.surface.blit(text, (button_rect.centerx - text.get_width() //
                               2, button_rect.centery - text.get_height() // 2))
 
             # Filename text (smaller, below map name)
-            filename_text = self.small_font.render(
-                map_info["filename"], True, text_color)
+            filename_text = FontManager.render(
+                map_info["filename"], self.small_font_size, text_color)
             self.surface.blit(filename_text,
                               (button_rect.centerx - filename_text.get_width() // 2,
                                button_rect.centery + text.get_height() // 2 + 5))
@@ -291,6 +282,9 @@ class MapEditor:
         self.should_run = True
         self.is_new_map = selected_map.get("is_new", False)
         self.current_filepath = None if self.is_new_map else selected_map["filepath"]
+        # 保存形式 ("json" または "stage")。開いたファイルの形式に合わせ、Fキーで切り替える
+        self.save_format = "stage" if self.current_filepath and is_binary_stage(
+            self.current_filepath) else "json"
         self.map_name = "新しいマップ" if self.is_new_map else selected_map["map_name"]
 
         # Initialize or load map data
@@ -306,7 +300,9 @@ class MapEditor:
         else:
             self._load_map(selected_map["filepath"])
 
-        self.terrains = []
+        # 編集中のマップを焼き込んだ描画レイヤー (塗ったマスだけ描き直す)
+        self.tile_layer = TileLayer()
+        self.tile_layer.build(self.map_in_editing)
         self.terrain_color = 1  # 今選択している色
         self.mouse_terrain = None  # マウスが選択している色
 
@@ -315,18 +311,19 @@ class MapEditor:
         for i in range(1, 10):  # 1-9 terrain types
             self.terrain_samples.append(i)
         self.terrain_samples.append(0)  # Add 0 (empty) as the last item
+        self.chip_size = 40
+        self.chip_images = self._make_chip_images()
 
         self._update_terrains()
 
     def _load_map(self, filepath):
         try:
-            with open(filepath, "r") as f:
-                map_data = json.load(f)
-                self.map_name = map_data.get("map_name", "名前なし")
-                self.map_in_editing = map_data.get("map_data", [])
-                print(f"マップを読み込みました: {self.map_name}")
-                self.notification.add(
-                    f"マップを読み込みました: {self.map_name}", color=settings.COLORS["green"])
+            map_data = _read_map_file(filepath)
+            self.map_name = map_data.get("map_name", "名前なし")
+            self.map_in_editing = map_data.get("map_data", [])
+            print(f"マップを読み込みました: {self.map_name}")
+            self.notification.add(
+                f"マップを読み込みました: {self.map_name}", color=settings.COLORS["green"])
         except Exception as e:
             error_msg = f"マップ読み込みエラー: {filepath.split('/')[-1]}"
             print(f"{error_msg}: {e}")
@@ -341,33 +338,44 @@ class MapEditor:
                 self.map_in_editing.append(tmp_map_list)
 
     def _update_terrains(self):
-        # map_in_editingを元にterrainsを更新する
-        self.terrains = []
-        for y, row in enumerate(self.map_in_editing):
-            for x, cell in enumerate(row):
-                if cell == 0:  # 0は何もないタイル
-                    continue
-                terrain = Terrain(
-                    self.surface, x, y, cell
-                )
-                self.terrains.append(terrain)
-
-        # マウスが選択している色のTerrainを作成 (accounting for header offset)
+        # マウスが選択している色のTerrainを、作り直さずに移動・変更する (accounting for header offset)
         x, y = pygame.mouse.get_pos()
         y -= self.header_height  # Adjust for header
         grid_x = int(x / settings.GRID_SIZE)
         grid_y = int(y / settings.GRID_SIZE)
 
         # Make sure coordinates are valid for terrain creation
-        if 0 <= grid_x < settings.WIDTH // settings.GRID_SIZE and 0 <= grid_y < settings.HEIGHT // settings.GRID_SIZE:
+        if not (0 <= grid_x < settings.WIDTH // settings.GRID_SIZE and 0 <= grid_y < settings.HEIGHT // settings.GRID_SIZE):
+            # Move the terrain outside the visible area if mouse is outside
+            grid_x, grid_y = -1, -1
+
+        if self.mouse_terrain is None:
             self.mouse_terrain = Terrain(
                 self.surface, grid_x, grid_y, self.terrain_color
             )
-        else:
-            # Create a terrain outside the visible area if mouse is outside
-            self.mouse_terrain = Terrain(
-                self.surface, -1, -1, self.terrain_color
-            )
+            return
+        if (self.mouse_terrain.grid_x, self.mouse_terrain.grid_y) != (grid_x, grid_y):
+            self.mouse_terrain.move_to(grid_x, grid_y)
+        if self.mouse_terrain.terrain_color != self.terrain_color:
+            self.mouse_terrain.set_terrain_color(self.terrain_color)
+
+    def _make_chip_images(self):
+        """フッターに並べるマップチップの画像を一度だけ作る"""
+        chip_images = {}
+        for terrain_id in self.terrain_samples:
+            if terrain_id == 0:
+                continue
+            # Create a small surface for the terrain
+            terrain_surface = pygame.Surface((self.chip_size, self.chip_size))
+            terrain_surface.fill(settings.COLORS["black"])
+
+            # Create a temporary terrain for visualization
+            temp_terrain = Terrain(terrain_surface, 0, 0, terrain_id)
+            temp_terrain.rect.width = self.chip_size
+            temp_terrain.rect.height = self.chip_size
+            temp_terrain.draw()
+            chip_images[terrain_id] = terrain_surface
+        return chip_images
 
     def _draw(self):
         # Fill the entire window with black
@@ -379,11 +387,12 @@ class MapEditor:
         pygame.draw.line(self.surface, settings.COLORS["white"], (
             0, self.header_height), (self.window_width, self.header_height), 2)
 
-        # Draw header text with Japanese font
-        font = FontManager.get_font(18)
-        name_text = font.render(
-            f"編集中: {self.map_name}", True, settings.COLORS["white"])
-        save_text = font.render("Sキー: 保存", True, settings.COLORS["white"])
+        # Draw header text with Japanese font (rendered text is cached)
+        font_size = 18
+        name_text = FontManager.render(
+            f"編集中: {self.map_name}", font_size, settings.COLORS["white"])
+        save_text = FontManager.render(
+            f"Sキー: 保存 ({self.save_format})  Fキー: 形式切替", font_size, settings.COLORS["white"])
         self.surface.blit(name_text, (10, 10))
         self.surface.blit(save_text, (self.window_width - save_text.get_width() - 10, 10))
 
@@ -396,14 +405,14 @@ class MapEditor:
             0, footer_top), (self.window_width, footer_top), 2)
 
         # Draw terrain chips in the footer
-        chip_size = 40
+        chip_size = self.chip_size
         chip_spacing = 20
         start_x = (self.window_width - (len(self.terrain_samples)
                    * (chip_size + chip_spacing) - chip_spacing)) // 2
 
         # Draw title for the terrain samples
-        sample_title = font.render(
-            "マップチップ一覧 (クリックまたは数字キーで選択)", True, settings.COLORS["white"])
+        sample_title = FontManager.render(
+            "マップチップ一覧 (クリックまたは数字キーで選択)", font_size, settings.COLORS["white"])
         self.surface.blit(sample_title, (self.window_width //
                           2 - sample_title.get_width() // 2, footer_top + 5))
 
@@ -428,18 +437,8 @@ class MapEditor:
 
             # Draw the terrain chip
             if terrain_id > 0:  # For non-empty terrain
-                # Create a small surface for the terrain
-                terrain_surface = pygame.Surface((chip_size, chip_size))
-                terrain_surface.fill(settings.COLORS["black"])
-
-                # Create a temporary terrain for visualization
-                temp_terrain = Terrain(terrain_surface, 0, 0, terrain_id)
-                temp_terrain.rect.width = chip_size
-                temp_terrain.rect.height = chip_size
-                temp_terrain.draw()
-
-                # Draw the terrain on the main surface
-                self.surface.blit(terrain_surface, (x_pos, y_pos))
+                # Draw the pre-rendered chip on the main surface
+                self.surface.blit(self.chip_images[terrain_id], (x_pos, y_pos))
             else:
                 # For empty terrain (0), just draw a border
                 empty_rect = pygame.Rect(x_pos, y_pos, chip_size, chip_size)
@@ -447,8 +446,8 @@ class MapEditor:
                     self.surface, settings.COLORS["white"], empty_rect, 1)
 
             # Draw number below the terrain
-            number_text = font.render(
-                str(terrain_id), True, settings.COLORS["white"])
+            number_text = FontManager.render(
+                str(terrain_id), font_size, settings.COLORS["white"])
             self.surface.blit(number_text, (x_pos + chip_size // 2 -
                               number_text.get_width() // 2, y_pos + chip_size + 5))
 
@@ -460,13 +459,7 @@ class MapEditor:
                     self.surface, settings.COLORS["red"], select_rect, 2)
 
         # Now draw the actual map in the middle section (offset by header height)
-        # Save the original surface position to restore it later
-        original_pos = {}
-        for obj in self.terrains:
-            original_pos[obj] = obj.rect.y
-            obj.rect.y += self.header_height
-            obj.draw()
-            obj.rect.y = original_pos[obj]  # Restore original position
+        self.tile_layer.draw(self.surface, (0, self.header_height))
 
         # Draw the mouse terrain with header offset
         if self.mouse_terrain:
@@ -480,7 +473,7 @@ class MapEditor:
 
     def _handle_footer_click(self, x, y):
         """Handle clicks in the footer area to select terrain types"""
-        chip_size = 40
+        chip_size = self.chip_size
         chip_spacing = 20
         start_x = (self.window_width - (len(self.terrain_samples)
                    * (chip_size + chip_spacing) - chip_spacing)) // 2
@@ -528,6 +521,8 @@ class MapEditor:
                         self.terrain_color = 0
                     if event.key == pygame.K_s:
                         self._save_map()
+                    if event.key == pygame.K_f:
+                        self.save_format = "stage" if self.save_format == "json" else "json"
 
             if pygame.mouse.get_pressed()[0]:
                 x, y = pygame.mouse.get_pos()
@@ -548,7 +543,10 @@ class MapEditor:
 
                         # Make sure we don't go out of bounds
                         if (0 <= grid_y < len(self.map_in_editing) and 0 <= grid_x < len(self.map_in_editing[0])):
-                            self.map_in_editing[grid_y][grid_x] = self.terrain_color
+                            if self.map_in_editing[grid_y][grid_x] != self.terrain_color:
+                                self.map_in_editing[grid_y][grid_x] = self.terrain_color
+                                self.tile_layer.set_tile(
+                                    grid_x, grid_y, self.terrain_color)
 
             self._update_terrains()
             self._draw()
@@ -567,23 +565,28 @@ class MapEditor:
         # Use existing filepath if editing an existing map, otherwise create a new one
         save_path = self.current_filepath if self.current_filepath else os.path.join(
             maps_dir, "new_map.json")
+        # 保存形式に合わせて拡張子を変える
+        extension = BINARY_EXTENSION if self.save_format == "stage" else ".json"
+        save_path = os.path.splitext(save_path)[0] + extension
 
         try:
-            with open(save_path, "w") as f:
-                json.dump({
-                    "map_name": self.map_name,
-                    "map_data": self.map_in_editing
-                }, f, ensure_ascii=False, indent=4)
+            if self.save_format == "stage":
+                write_stage(save_path, self.map_name, self.map_in_editing)
+            else:
+                with open(save_path, "w") as f:
+                    json.dump({
+                        "map_name": self.map_name,
+                        "map_data": self.map_in_editing
+                    }, f, ensure_ascii=False, indent=4)
 
             filename = save_path.split('/')[-1]
             success_msg = f"マップを保存しました: {filename}"
             print(success_msg)
             self.notification.add(success_msg, color=settings.COLORS["green"])
 
-            # Update current filepath if this was a new map
-            if self.is_new_map:
-                self.is_new_map = False
-                self.current_filepath = save_path
+            # Update current filepath if this was a new map (or saved in another format)
+            self.is_new_map = False
+            self.current_filepath = save_path
 
         except Exception as e:
             error_msg = "保存エラー"
@@ -7,10 +7,12 @@ IMAGE_ROWS = 4
 IMAGE_COLS = 4
 SPRITE_WIDTH = 32
 SPRITE_HEIGHT = 96
+START_POS = (30, 30)  # ステージ開始時の位置
+MAX_HP = 100
 
 
 class Player(SpriteWithFrames):
-    def __init__(self, surface, map, pos, sound_manager):
+    def __init__(self, surface, map, pos, sound_manager, get_pressed=None):
         super().__init__(
             surface=surface,
             pos=pos,
@@ -25,8 +27,10 @@ class Player(SpriteWithFrames):
         self.dy = 0  # y方向の速度
         self.map = map
         self.sound_manager = sound_manager
-        self.hp = 100
-        self.max_hp = 100
+        # キー入力の取得元 (ヘッドレス実行時は差し替えられる)
+        self.get_pressed = get_pressed if get_pressed is not None else pygame.key.get_pressed
+        self.hp = MAX_HP
+        self.max_hp = MAX_HP
         self.is_clear = False
         self.has_motion_blur = True
         self.was_on_ground = False  # 前フレームで地面にいたかどうか
@@ -47,11 +51,12 @@ class Player(SpriteWithFrames):
 
         super()._frame_animation()
 
-    def draw(self):
+    def draw(self, offset=(0, 0)):
         # プレイヤーの画像を中央寄せで描画する
-        super().draw(
+        return super().draw(
             is_player=True,
             is_center=True,
+            offset=offset,
         )
 
     def move_left_right(self, dx):
@@ -59,13 +64,13 @@ class Player(SpriteWithFrames):
 
         if self.rect.left < 0:
             self.rect.left = 0
-        if self.rect.right > settings.WIDTH:
-            self.rect.right = settings.WIDTH
+        if self.rect.right > self.map.pixel_width:
+            self.rect.right = self.map.pixel_width
 
         self._collide_left_right()
 
     def key_control(self):
-        key = pygame.key.get_pressed()
+        key = self.get_pressed()
 
         # 左右の移動に関するキーコントロール
         if key[pygame.K_LEFT]:
@@ -113,53 +118,46 @@ class Player(SpriteWithFrames):
     def _collide_up_down(self):
         if self.dy > 0:
             # 下方向の衝突判定
-            for obj in self.map.map_objects:
-                if self.rect.colliderect(obj.rect):
-                    self.rect.bottom = obj.rect.top
-                    self.dy = 0
-                    self.terrain_damage(obj)
-                    self.check_on_goal(obj)
-                    return
+            for obj in self.map.tiles_overlapping(self.rect):
+                self.rect.bottom = obj.rect.top
+                self.dy = 0
+                self.terrain_damage(obj)
+                self.check_on_goal(obj)
+                return
         if self.dy < 0:
             # 上方向の衝突判定
-            for obj in self.map.map_objects:
-                if self.rect.colliderect(obj.rect):
-                    self.rect.top = obj.rect.bottom
-                    self.dy = 0
-                    self.check_on_goal(obj)
-                    return
+            for obj in self.map.tiles_overlapping(self.rect):
+                self.rect.top = obj.rect.bottom
+                self.dy = 0
+                self.check_on_goal(obj)
+                return
 
     def _collide_left_right(self):
         if self.dx > 0:
             # 右方向の衝突判定
-            for obj in self.map.map_objects:
-                if self.rect.colliderect(obj.rect):
-                    self.rect.right = obj.rect.left
-                    self.dx = 0
-                    self.check_on_goal(obj)
-                    return
+            for obj in self.map.tiles_overlapping(self.rect):
+                self.rect.right = obj.rect.left
+                self.dx = 0
+                self.check_on_goal(obj)
+                return
         if self.dx < 0:
             # 左方向の衝突判定
-            for obj in self.map.map_objects:
-                if self.rect.colliderect(obj.rect):
-                    self.rect.left = obj.rect.right
-                    self.dx = 0
-                    self.check_on_goal(obj)
-                    return
+            for obj in self.map.tiles_overlapping(self.rect):
+                self.rect.left = obj.rect.right
+                self.dx = 0
+                self.check_on_goal(obj)
+                return
 
     def _on_ground(self):
         # プレイヤーが地面に接しているかどうかを判定する
         self.rect.y += 1
-        for obj in self.map.map_objects:
-            if self.rect.colliderect(obj.rect):
-                self.rect.y -= 1
-                return True
+        is_on_ground = bool(self.map.tiles_overlapping(self.rect))
         self.rect.y -= 1
-        return False
+        return is_on_ground
 
     # プレイヤーが落ちたとき
     def fall(self):
-        if self.rect.y > settings.HEIGHT:
+        if self.rect.y > self.map.pixel_height:
             self.hp = 0
 
     # ダメージ床の処理
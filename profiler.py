@@ -0,0 +1,167 @@
+import csv
+import json
+import time
+from collections import deque
+import settings
+from font_cache import FontCache
+
+# オーバーレイ・ダンプに並べる計測区間
+SECTIONS = (
+    "Player.update",
+    "Enemy.update",
+    "Enemy.can_reach_other_side",
+    "Map.stream",
+    "Background.draw",
+    "Map.draw",
+    "UI.draw",
+    "display.update",
+)
+ROLLING_WINDOW = 300  # パーセンタイルを計算するフレーム数
+OVERLAY_POSITION = (settings.WIDTH - 10, 10)  # 右上揃え
+OVERLAY_FONT_SIZE = 14
+
+
+class _Section:
+    """with 文で囲んだ区間の経過時間をフレームごとに積算する"""
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        current = self.profiler.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class _NullSection:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SECTION = _NullSection()
+
+
+class FrameProfiler:
+    """サブシステムごとのフレーム時間を計測する
+
+    settings.IS_DEBUG_MODE が有効なとき、またはダンプ先が指定されたときだけ計測する。
+    フレーム時間は begin_frame から end_frame までの処理時間 (clock.tick の待ち時間を除く)。
+    """
+
+    def __init__(self):
+        self.enabled = settings.IS_DEBUG_MODE
+        self.frame_budget = 1.0 / settings.FPS
+        self.frame_times = deque(maxlen=ROLLING_WINDOW)
+        self.current = {}
+        self.last = {}
+        self.frame_count = 0
+        self.dropped_frames = 0
+        self.history = None  # ダンプ用の全フレーム記録 (enable_history で有効化)
+        self._sections = {}
+        self._frame_start = None
+        self._font = None
+
+    def enable_history(self):
+        self.enabled = True
+        self.history = []
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL_SECTION
+        section = self._sections.get(name)
+        if section is None:
+            section = _Section(self, name)
+            self._sections[name] = section
+        return section
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.current = {}
+        self._frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        frame_time = time.perf_counter() - self._frame_start
+        self.frame_times.append(frame_time)
+        self.frame_count += 1
+        if frame_time > self.frame_budget:
+            self.dropped_frames += 1
+        self.last = self.current
+        if self.history is not None:
+            self.history.append((frame_time, self.current))
+
+    def percentile(self, p):
+        """直近 ROLLING_WINDOW フレームのフレーム時間のパーセンタイル (秒)"""
+        if not self.frame_times:
+            return 0.0
+        ordered = sorted(self.frame_times)
+        index = min(len(ordered) - 1, int(len(ordered) * p / 100))
+        return ordered[index]
+
+    def summary(self):
+        return {
+            "fps_target": settings.FPS,
+            "frames": self.frame_count,
+            "dropped_frames": self.dropped_frames,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+        }
+
+    def draw(self, surface, extra_lines=()):
+        """フレーム時間の内訳を右上に表示する (extra_lines は末尾に追加する行)"""
+        if self._font is None:
+            self._font = FontCache.get_font(OVERLAY_FONT_SIZE)
+        summary = self.summary()
+        lines = [
+            f"p50 {summary['p50_ms']:.2f}ms  p95 {summary['p95_ms']:.2f}ms  "
+            f"p99 {summary['p99_ms']:.2f}ms",
+            f"dropped {summary['dropped_frames']}/{summary['frames']}",
+        ]
+        for name in SECTIONS:
+            lines.append(f"{name}: {self.last.get(name, 0.0) * 1000:.2f}ms")
+        lines.extend(extra_lines)
+
+        x, y = OVERLAY_POSITION
+        for line in lines:
+            text = self._font.render(line, True, settings.COLORS["yellow"])
+            surface.blit(text, (x - text.get_width(), y))
+            y += text.get_height()
+
+    def dump(self, path):
+        """記録した全フレームを CSV または JSON (拡張子で判断) に書き出す"""
+        history = self.history or []
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump({
+                    "summary": self.summary(),
+                    "frames": [
+                        dict({"frame_ms": frame_time * 1000},
+                             **{name: sections.get(name, 0.0) * 1000 for name in SECTIONS})
+                        for frame_time, sections in history
+                    ],
+                }, f, ensure_ascii=False)
+            return
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame", "frame_ms"] + [f"{name}_ms" for name in SECTIONS])
+            for i, (frame_time, sections) in enumerate(history):
+                writer.writerow(
+                    [i, f"{frame_time * 1000:.4f}"]
+                    + [f"{sections.get(name, 0.0) * 1000:.4f}" for name in SECTIONS])
+
+
+# ゲーム全体で共有するプロファイラ
+profiler = FrameProfiler()
@@ -0,0 +1,82 @@
+from collections import deque
+import settings
+from stage import ENEMY_SPAWN_INTERVAL
+
+
+class QualityGovernor:
+    """直近のフレーム時間を見て、描画の効果や敵の量を段階的に落とす・戻す
+
+    level 0 が最高品質で、settings.QUALITY_LEVELS の順に軽くなる。
+    直近 settings.QUALITY_WINDOW フレームの平均処理時間が予算 (1 / fps) の
+    QUALITY_DOWNGRADE_RATIO 倍を超えたら1段下げ、QUALITY_UPGRADE_RATIO 倍を
+    下回る状態が QUALITY_UPGRADE_DELAY フレーム続いたら1段戻す。
+    段階を変えたら計測をやり直すので、行ったり来たりはしにくい。
+
+    敵の数や出現間隔はゲームの進み方を変えるので、allow_gameplay_changes が
+    False のとき (入力を記録しているときなど) は変えない。
+    """
+
+    def __init__(self, fps=settings.FPS, level=settings.QUALITY_INITIAL_LEVEL):
+        self.levels = settings.QUALITY_LEVELS
+        self.level = min(level, len(self.levels) - 1)
+        self.frame_budget = 1.0 / fps
+        self.frame_times = deque(maxlen=settings.QUALITY_WINDOW)
+        self.headroom_frames = 0  # 余裕がある状態が続いているフレーム数
+        self.allow_gameplay_changes = True
+        self.changes = 0  # 段階を変えた回数
+
+    @property
+    def current(self):
+        """現在の段階の設定"""
+        return self.levels[self.level]
+
+    def set_fps(self, fps):
+        self.frame_budget = 1.0 / fps
+        self._restart()
+
+    def record(self, frame_time):
+        """1フレームの処理時間 (秒、フレーム待ちを除く) を記録し、必要なら段階を変える"""
+        self.frame_times.append(frame_time)
+        if len(self.frame_times) < self.frame_times.maxlen:
+            return
+        average = sum(self.frame_times) / len(self.frame_times)
+        if average > self.frame_budget * settings.QUALITY_DOWNGRADE_RATIO:
+            self.headroom_frames = 0
+            if self.level < len(self.levels) - 1:
+                self._set_level(self.level + 1)
+        elif average < self.frame_budget * settings.QUALITY_UPGRADE_RATIO:
+            self.headroom_frames += 1
+            if self.headroom_frames >= settings.QUALITY_UPGRADE_DELAY and self.level > 0:
+                self._set_level(self.level - 1)
+        else:
+            self.headroom_frames = 0
+
+    def _set_level(self, level):
+        self.level = level
+        self.changes += 1
+        self._restart()
+
+    def _restart(self):
+        self.frame_times.clear()
+        self.headroom_frames = 0
+
+    def apply(self, stage):
+        """現在の段階の設定を stage に反映する (毎フレーム呼んでよい)"""
+        level = self.current
+        player = stage.player
+        player.has_motion_blur = level["motion_blur"]
+        player.max_blur_frames = level["blur_frames"]  # 1 以上
+        del player.previous_positions[:-level["blur_frames"]]
+        stage.draw_background = level["background"]
+        if self.allow_gameplay_changes:
+            stage.max_enemies = level["max_enemies"]
+            stage.enemy_spawn_interval = round(
+                ENEMY_SPAWN_INTERVAL * level["spawn_interval_scale"])
+
+    def describe(self):
+        """デバッグ表示用の1行"""
+        average = sum(self.frame_times) / len(self.frame_times) if self.frame_times else 0.0
+        return (
+            f"quality {self.level}/{len(self.levels) - 1}  "
+            f"avg {average * 1000:.2f}/{self.frame_budget * 1000:.2f}ms  "
+            f"changes {self.changes}")
@@ -0,0 +1,79 @@
+import struct
+import zlib
+import pygame
+
+# ファイル形式: ヘッダー + zlib 圧縮した入力列 (1フレーム1バイトのビットマスク)
+MAGIC = b"KRRP"
+VERSION = 1
+HEADER = struct.Struct("<4sBBQII")  # magic, version, stage_index, seed, frame_count, checksum
+
+# 記録対象のキー (並び順がビットの位置になる)
+INPUT_KEYS = (pygame.K_LEFT, pygame.K_RIGHT, pygame.K_SPACE)
+
+_PLAYER_STATE = struct.Struct("<iiiii")
+_ENEMY_STATE = struct.Struct("<dd")
+
+
+def encode_keys(key):
+    """キー入力 (pygame.key.get_pressed() 互換) をビットマスクに変換する"""
+    mask = 0
+    for bit, key_code in enumerate(INPUT_KEYS):
+        if key[key_code]:
+            mask |= 1 << bit
+    return mask
+
+
+def decode_keys(mask):
+    """ビットマスクを押されているキーの集合に戻す"""
+    return {key_code for bit, key_code in enumerate(INPUT_KEYS) if mask & (1 << bit)}
+
+
+def stage_checksum(stage, checksum=0):
+    """ステージの状態 (プレイヤー・敵) を checksum に積算する"""
+    player = stage.player
+    data = _PLAYER_STATE.pack(
+        player.rect.x, player.rect.y, player.hp,
+        len(stage.enemies), stage.is_clearing)
+    for enemy in stage.enemies:
+        data += _ENEMY_STATE.pack(enemy.x, enemy.y)
+    return zlib.crc32(data, checksum)
+
+
+class Replay:
+    """1プレイ分の入力とシードを記録・再生するためのデータ"""
+
+    def __init__(self, seed, stage_index=0, inputs=b"", checksum=0):
+        self.seed = seed
+        self.stage_index = stage_index
+        self.inputs = bytearray(inputs)
+        # 記録時に積算したステージ状態のチェックサム (再生結果の検証に使う)
+        self.checksum = checksum
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def record(self, key, stage):
+        self.inputs.append(encode_keys(key))
+        self.checksum = stage_checksum(stage, self.checksum)
+
+    def save(self, path):
+        header = HEADER.pack(
+            MAGIC, VERSION, self.stage_index, self.seed,
+            len(self.inputs), self.checksum)
+        with open(path, "wb") as f:
+            f.write(header)
+            f.write(zlib.compress(bytes(self.inputs), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as f:
+            data = f.read()
+        magic, version, stage_index, seed, frame_count, checksum = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"リプレイファイルではありません: {path}")
+        if version != VERSION:
+            raise ValueError(f"未対応のリプレイバージョンです: {version}")
+        inputs = zlib.decompress(data[HEADER.size:])
+        if len(inputs) != frame_count:
+            raise ValueError(f"リプレイファイルが壊れています: {path}")
+        return cls(seed, stage_index, inputs, checksum)
@@ -1,3 +1,5 @@
+import os
+
 IS_DEBUG_MODE = False
 
 FONT_FILE_NAME = "PixelMplus12-Regular.ttf"
@@ -10,12 +12,34 @@ HEIGHT = 576
 # ウィンドウタイトル
 TITLE = "くらりのプラットフォーマー"
 
-# FPS
+# FPS (描画の上限)
 FPS = 60
 
+# ゲームを進める間隔 (1秒あたりの更新回数)。描画が遅れても同じ速さで進む
+SIMULATION_FPS = 60
+# 描画1回あたりに追いつくために行う更新の最大数 (超えた分はゲームが遅くなる)
+MAX_SIMULATION_STEPS = 5
+
+# 変化した範囲だけを描き直して画面に反映する (False なら毎フレーム画面全体)
+USE_DIRTY_RECTS = False
+
 # 1マスの大きさ
 GRID_SIZE = 32
 
+# マップを分割して読み込む単位 (1辺のマス数)
+CHUNK_SIZE = 8
+
+# チャンクをワーカースレッドで先読みする (False ならメインスレッドで作る)
+USE_CHUNK_STREAMING = True
+# 作成済みのチャンクを残しておくメモリの上限 (バイト)
+CHUNK_MEMORY_BUDGET = 32 * 1024 * 1024
+
+# 反転・拡大縮小したスプライト画像を保持する最大数
+TRANSFORM_CACHE_SIZE = 64
+
+# 描画済みのテキストを保持する最大数
+TEXT_CACHE_SIZE = 128
+
 # 色
 COLORS = {
     "white": (255, 255, 255),
@@ -47,9 +71,57 @@ PLAYER_ACCELERATION = 0.5  # プレイヤーの加速度
 PLAYER_GRAVITY = 1  # プレイヤーの重力
 PLAYER_JUMP_POWER = 11  # プレイヤーのジャンプ力
 
+# 敵をまとめて配列で更新する (numpy が必要)
+USE_ENEMY_SYSTEM = False
+
 # ステージファイル
 STAGE_FILE_NAMES = [
     "n_stage1.json",
     "n_stage2.json",
     "n_stage3.json",
 ]
+
+# 起動時に画像・効果音をデコードするスレッドの数
+ASSET_LOADER_WORKERS = 4
+
+# 効果音
+USE_SOUND_CACHE = True  # デコード済みの効果音をキャッシュする
+SOUND_CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache", "se")
+SOUND_MIN_INTERVAL = 50  # 同じ効果音をこの間隔 (ミリ秒) 以内に続けて鳴らさない
+# 効果音のグループと、グループごとに予約するチャンネル数 (同時に鳴らせる数)
+SOUND_GROUP_CHANNELS = {
+    "player": 2,
+    "damage": 2,
+    "system": 2,
+}
+SOUND_GROUPS = {
+    "jump": "player",
+    "landing": "player",
+    "damage": "damage",
+    "submit": "system",
+    "clear": "system",
+}
+DEFAULT_SOUND_GROUP = "system"
+
+# フレーム時間に応じて品質を自動で調整する (quality.QualityGovernor)
+USE_QUALITY_GOVERNOR = True
+QUALITY_INITIAL_LEVEL = 0
+QUALITY_WINDOW = 60  # 平均をとるフレーム数
+QUALITY_DOWNGRADE_RATIO = 0.9  # 平均処理時間が予算のこの割合を超えたら品質を下げる
+QUALITY_UPGRADE_RATIO = 0.5  # 平均処理時間が予算のこの割合を下回ったら品質を戻す
+QUALITY_UPGRADE_DELAY = 180  # 品質を戻すまでに余裕のある状態が続くべきフレーム数
+# 品質の段階 (0 が最高品質で、調整しない場合と同じ描画)
+# 残像は元々1フレーム分なので、それより下の段階では消すだけにする
+QUALITY_LEVELS = [
+    {"motion_blur": True, "blur_frames": 1, "background": True,
+     "max_enemies": None, "spawn_interval_scale": 1.0},
+    {"motion_blur": False, "blur_frames": 1, "background": True,
+     "max_enemies": None, "spawn_interval_scale": 1.0},
+    {"motion_blur": False, "blur_frames": 1, "background": True,
+     "max_enemies": 100, "spawn_interval_scale": 1.5},
+    {"motion_blur": False, "blur_frames": 1, "background": False,
+     "max_enemies": 30, "spawn_interval_scale": 2.0},
+]
+
+# ステージのクリア可能性チェック (solver.py) の結果のキャッシュ
+SOLVER_CACHE_PATH = os.path.join(os.path.dirname(__file__), ".cache", "solver.json")
@@ -0,0 +1,422 @@
+"""ステージをクリアできるかどうかを調べる
+
+    python solver.py [n_stage1.json ...] [--jobs 4] [--no-cache]
+
+プレイヤーの状態 (位置・速度・HP) を、Player.update と同じ物理 (settings.PLAYER_*) で
+1フレームずつ進めて幅優先探索し、やられずにゴール (地形番号 9) に届くかどうか、
+最短の入力列、避けられないダメージ床を調べる。敵は考えない。
+ステージを省略した場合は maps/ 以下のすべてを CPU コア数のプロセスで並列に調べる。
+結果はステージの内容と物理の設定のハッシュをキーに settings.SOLVER_CACHE_PATH に保存する。
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pygame
+import settings
+from player import MAX_HP, SPRITE_WIDTH, SPRITE_HEIGHT, START_POS
+from stage_cache import MAPS_DIR, load_stage_file
+from stage_format import BINARY_EXTENSION
+from terrain import TILE_DAMAGE, TILE_GOAL, TILE_SOLID
+
+SOLVER_VERSION = 3  # 探索の方法を変えたら上げる (キャッシュを無効にする)
+MAX_FRAMES = 3600  # これより長い入力列は探さない
+MAX_STATES = 1_000_000  # 調べる状態数の上限
+# 位置をこのピクセル数ごとにまとめて、同じ区画・同じ速度の状態は一度しか調べない
+# (見つかった入力列は実際にたどれるが、最短とは限らず、区画が粗いほど見逃しは増える。
+# 見つからなかった場合は、まとめずに調べ直してから「クリアできない」とする)
+POSITION_CELL = 4
+# 同じ区画に来た状態は、HP がこの値ごとの段階で上回るときだけ調べ直す
+# (HP の差が小さい状態は見逃すが、見つかった入力列でやられることはない)
+HP_CELL = 20
+
+# 1フレームの入力 (左, 右, ジャンプ)。前にあるものほど入力列に選ばれやすい
+ACTIONS = (
+    (False, True, False),
+    (True, False, False),
+    (False, False, False),
+    (False, True, True),
+    (True, False, True),
+    (False, False, True),
+)
+
+
+def _action_name(action):
+    left, right, jump = action
+    name = ("L" if left else "") + ("R" if right else "") + ("J" if jump else "")
+    return name or "-"
+
+
+class StageSolver:
+    """1つのステージについて、プレイヤーの状態空間を幅優先探索する
+
+    状態は (x, y, dx, dy, hp)。位置は pygame.Rect と同じく整数に丸めるので、
+    探索は実際のゲームと同じ状態をたどる。すでに調べたかどうかは、位置を
+    position_cell ピクセルごとの区画にまとめた (区画, dx, dy) で判定し、
+    HP を hp_cell ごとにまとめた段階が先に調べた状態より上の場合だけ調べ直す。
+    ダメージ床で HP がなくなる遷移は使わない (Stage.update ではやり直しになる)。
+    """
+
+    def __init__(self, stage, max_frames=MAX_FRAMES, max_states=MAX_STATES,
+                 position_cell=POSITION_CELL, hp_cell=HP_CELL):
+        # stage は load_stage_file の (ステージ名, 幅, 高さ, 地形番号)
+        _, self.width, self.height, self.tiles = stage
+        self.pixel_width = self.width * settings.GRID_SIZE
+        self.pixel_height = self.height * settings.GRID_SIZE
+        self.max_frames = max_frames
+        self.max_states = max_states
+        self.position_cell = position_cell
+        self.hp_cell = hp_cell
+
+    def _first_tile(self, rect):
+        """Map.tiles_overlapping と同じ順序で、rect と重なる最初の地形のマス番号を返す"""
+        left = max(rect.left // settings.GRID_SIZE, 0)
+        right = min((rect.right - 1) // settings.GRID_SIZE, self.width - 1)
+        top = max(rect.top // settings.GRID_SIZE, 0)
+        bottom = min((rect.bottom - 1) // settings.GRID_SIZE, self.height - 1)
+        for grid_y in range(top, bottom + 1):
+            row_start = grid_y * self.width
+            for grid_x in range(left, right + 1):
+                if TILE_SOLID[self.tiles[row_start + grid_x]]:
+                    return row_start + grid_x
+        return None
+
+    def _tile_rect(self, index):
+        return pygame.Rect(
+            index % self.width * settings.GRID_SIZE,
+            index // self.width * settings.GRID_SIZE,
+            settings.GRID_SIZE, settings.GRID_SIZE)
+
+    def step(self, state, action):
+        """Player.update と同じ順序で1フレーム進める (jump は地面にいるときだけ指定すること)
+
+        (次の状態, 踏んだダメージ床のマス番号または None, ゴールに触れたか) を返す。
+        落ちたか、ダメージ床で HP がなくなってやられた場合は次の状態が None。
+        """
+        x, y, dx, dy, hp = state
+        left, right, jump = action
+        rect = pygame.Rect(x, y, SPRITE_WIDTH, SPRITE_HEIGHT)
+        damage_tile = None
+        is_goal = False
+
+        # Player.key_control
+        if left:
+            dx -= settings.PLAYER_ACCELERATION
+            if dx < -settings.PLAYER_MAX_SPEED:
+                dx = -settings.PLAYER_MAX_SPEED
+        if right:
+            dx += settings.PLAYER_ACCELERATION
+            if dx > settings.PLAYER_MAX_SPEED:
+                dx = settings.PLAYER_MAX_SPEED
+        if not left and not right:
+            if dx > 0:
+                dx = max(dx - settings.PLAYER_ACCELERATION, 0)
+            if dx < 0:
+                dx = min(dx + settings.PLAYER_ACCELERATION, 0)
+        if jump:
+            dy = -settings.PLAYER_JUMP_POWER  # 地面にいるときだけ呼ばれる
+
+        # Player.move_up_down
+        dy += settings.PLAYER_GRAVITY
+        if dy > settings.PLAYER_MAX_SPEED:
+            dy = settings.PLAYER_MAX_SPEED
+        rect.y += dy
+        if dy != 0:
+            tile = self._first_tile(rect)
+            if tile is not None:
+                tile_rect = self._tile_rect(tile)
+                if dy > 0:
+                    rect.bottom = tile_rect.top
+                    # Player.terrain_damage (床の上にいる間は毎フレーム減る)
+                    if TILE_DAMAGE[self.tiles[tile]]:
+                        damage_tile = tile
+                        hp -= TILE_DAMAGE[self.tiles[tile]]
+                        if hp <= 0:
+                            return None, damage_tile, False
+                else:
+                    rect.top = tile_rect.bottom
+                dy = 0
+                is_goal = bool(TILE_GOAL[self.tiles[tile]])
+
+        # Player.fall
+        if rect.y > self.pixel_height:
+            return None, damage_tile, False
+
+        # Player.move_left_right
+        rect.x += dx
+        if rect.left < 0:
+            rect.left = 0
+        if rect.right > self.pixel_width:
+            rect.right = self.pixel_width
+        if dx != 0:
+            tile = self._first_tile(rect)
+            if tile is not None:
+                tile_rect = self._tile_rect(tile)
+                if dx > 0:
+                    rect.right = tile_rect.left
+                else:
+                    rect.left = tile_rect.right
+                dx = 0
+                is_goal = is_goal or bool(TILE_GOAL[self.tiles[tile]])
+
+        return (rect.x, rect.y, dx, dy, hp), damage_tile, is_goal
+
+    def search(self, forbidden=frozenset(), exact=False):
+        """ゴールまでの最短の入力列を探す
+
+        forbidden に含まれるダメージ床を踏む遷移は使わない。
+        exact が True なら状態を区画にまとめない (同じ位置・速度では HP の多い状態だけを
+        残すので、見逃しはなく、見つかった入力列は最短になる)。
+        (入力列または None, 探索中に踏んだダメージ床の集合, 調べた状態数) を返す。
+        """
+        position_cell = 1 if exact else self.position_cell
+        hp_cell = 1 if exact else self.hp_cell
+        start = self.start_state()
+        parents = {start: None}  # state -> (前の状態, 入力)
+        visited = {self._key(start, position_cell): start[4] // hp_cell}  # key -> HP の区画の最大
+        frontier = deque([(start, 0)])
+        touched = set()
+        while frontier:
+            state, frames = frontier.popleft()
+            if frames >= self.max_frames:
+                continue
+            # 空中ではジャンプしても何も起きないので、ジャンプなしの入力だけ調べる
+            actions = ACTIONS if self._on_ground(state) else ACTIONS[:3]
+            for action in actions:
+                next_state, damage_tile, is_goal = self.step(state, action)
+                if next_state is None:
+                    continue
+                if damage_tile is not None:
+                    if damage_tile in forbidden:
+                        continue
+                    touched.add(damage_tile)
+                if is_goal:
+                    return self._path(parents, state) + [action], touched, len(parents)
+                key = self._key(next_state, position_cell)
+                hp_level = next_state[4] // hp_cell
+                # 先に (少ないフレームで) 同じかより多い HP で来た状態があれば調べない
+                if visited.get(key, -1) >= hp_level:
+                    continue
+                visited[key] = hp_level
+                parents[next_state] = (state, action)
+                if len(parents) > self.max_states:
+                    return None, touched, len(parents)
+                frontier.append((next_state, frames + 1))
+        return None, touched, len(parents)
+
+    @staticmethod
+    def start_state():
+        return (START_POS[0], START_POS[1], 0, 0, MAX_HP)
+
+    @staticmethod
+    def _key(state, position_cell):
+        x, y, dx, dy = state[:4]
+        return (x // position_cell, y // position_cell, dx, dy)
+
+    @property
+    def is_exact(self):
+        return self.position_cell == 1 and self.hp_cell == 1
+
+    def _checked_search(self, forbidden=frozenset()):
+        """search で見つからなければ、状態をまとめずに調べ直す
+
+        (入力列または None, 調べた状態数, 結果が近似か) を返す。近似になるのは、
+        まとめた探索で見つかった (最短とは限らない) 場合と、状態数の上限で打ち切った場合。
+        """
+        path, _, states = self.search(forbidden)
+        if path is None and not self.is_exact and states <= self.max_states:
+            path, _, exact_states = self.search(forbidden, exact=True)
+            states += exact_states
+            return path, states, exact_states > self.max_states
+        return path, states, not self.is_exact or states > self.max_states
+
+    def _on_ground(self, state):
+        # Player._on_ground と同じ判定
+        rect = pygame.Rect(state[0], state[1] + 1, SPRITE_WIDTH, SPRITE_HEIGHT)
+        return self._first_tile(rect) is not None
+
+    @staticmethod
+    def _path(parents, state):
+        actions = []
+        while parents[state] is not None:
+            state, action = parents[state]
+            actions.append(action)
+        actions.reverse()
+        return actions
+
+    def solve(self):
+        """ステージを調べた結果を辞書で返す"""
+        start_time = time.perf_counter()
+        path, states, approximate = self._checked_search()
+        unavoidable = []
+        damage_free = True
+        if path is not None:
+            # 避けられないダメージ床は、最短の入力列でも必ず踏んでいるはず
+            on_path = self.damage_tiles(path)
+            all_damage = frozenset(
+                index for index, terrain_color in enumerate(self.tiles)
+                if TILE_DAMAGE[terrain_color])
+            if on_path:
+                free_path, _, free_approximate = self._checked_search(all_damage)
+                damage_free = free_path is not None
+                if not damage_free:
+                    approximate = approximate or free_approximate
+                    # 1枚ずつ踏まないようにしてもクリアできなければ、その床は避けられない
+                    for tile in sorted(on_path):
+                        tile_path, _, tile_approximate = self._checked_search(frozenset((tile,)))
+                        if tile_path is None:
+                            unavoidable.append([tile % self.width, tile // self.width])
+                            approximate = approximate or tile_approximate
+        return {
+            "solvable": path is not None,
+            "frames": len(path) if path is not None else None,
+            "inputs": _compress(path) if path is not None else None,
+            "damage_free": damage_free,  # ダメージ床を1枚も踏まずにクリアできるか
+            "unavoidable_damage": unavoidable,
+            "states": states,
+            # True なら frames は最短とは限らず、状態数の上限で打ち切った探索の
+            # 「クリアできない」「避けられない」には見逃しがありうる
+            "approximate": approximate,
+            "seconds": time.perf_counter() - start_time,
+        }
+
+    def damage_tiles(self, path):
+        """入力列をたどったときに踏むダメージ床のマス番号の集合"""
+        state = self.start_state()
+        tiles = set()
+        for action in path:
+            state, damage_tile, _ = self.step(state, action)
+            if damage_tile is not None:
+                tiles.add(damage_tile)
+        return tiles
+
+
+def _compress(actions):
+    """入力列を [入力名, 続くフレーム数] の並びにする"""
+    runs = []
+    for action in actions:
+        name = _action_name(action)
+        if runs and runs[-1][0] == name:
+            runs[-1][1] += 1
+        else:
+            runs.append([name, 1])
+    return runs
+
+
+def stage_hash(filename):
+    """ステージの内容と、探索結果に影響する設定のハッシュ"""
+    digest = hashlib.sha256()
+    with open(os.path.join(MAPS_DIR, filename), "rb") as f:
+        digest.update(f.read())
+    digest.update(repr((
+        SOLVER_VERSION, MAX_FRAMES, MAX_STATES, POSITION_CELL, HP_CELL, settings.GRID_SIZE,
+        settings.PLAYER_MAX_SPEED, settings.PLAYER_ACCELERATION,
+        settings.PLAYER_GRAVITY, settings.PLAYER_JUMP_POWER,
+        SPRITE_WIDTH, SPRITE_HEIGHT, START_POS, MAX_HP,
+        bytes(TILE_SOLID), bytes(TILE_DAMAGE), bytes(TILE_GOAL),
+    )).encode())
+    return digest.hexdigest()
+
+
+def solve_stage(filename):
+    """maps/ 以下のステージを調べる (ワーカープロセスで実行される)"""
+    return StageSolver(load_stage_file(filename)).solve()
+
+
+def load_cache():
+    try:
+        with open(settings.SOLVER_CACHE_PATH, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache):
+    os.makedirs(os.path.dirname(settings.SOLVER_CACHE_PATH), exist_ok=True)
+    with open(settings.SOLVER_CACHE_PATH, "w") as f:
+        json.dump(cache, f)
+
+
+def solve_stages(filenames, jobs=None, use_cache=True, on_result=None):
+    """複数のステージをプロセスプールで並列に調べる
+
+    キャッシュにある (内容が変わっていない) ステージは調べ直さない。
+    on_result(filename, result, cached) を結果がそろった順に呼ぶ。
+    {filename: result} を返す。
+    """
+    cache = load_cache() if use_cache else {}
+    hashes = {filename: stage_hash(filename) for filename in filenames}
+    results = {}
+    pending = []
+    for filename in filenames:
+        result = cache.get(hashes[filename])
+        if result is not None:
+            results[filename] = result
+            if on_result is not None:
+                on_result(filename, result, True)
+        else:
+            pending.append(filename)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(solve_stage, filename): filename for filename in pending}
+            for future in as_completed(futures):
+                filename = futures[future]
+                result = future.result()
+                results[filename] = result
+                cache[hashes[filename]] = result
+                if on_result is not None:
+                    on_result(filename, result, False)
+        if use_cache:
+            save_cache(cache)
+    return results
+
+
+def stage_files():
+    """maps/ 以下のステージファイルの一覧"""
+    return sorted(
+        filename for filename in os.listdir(MAPS_DIR)
+        if filename.endswith(".json") or filename.endswith(BINARY_EXTENSION))
+
+
+def print_result(filename, result, cached):
+    source = " (cache)" if cached else f" ({result['seconds']:.2f}s, {result['states']} states)"
+    if not result["solvable"]:
+        print(f"{filename}: クリアできません{source}")
+        if result["approximate"]:
+            print("  (近似: 状態数の上限で探索を打ち切ったので、クリアできる可能性があります)")
+        return
+    print(f"{filename}: クリア可能 {result['frames']} frames{source}")
+    if result["approximate"]:
+        print("  (近似: 状態をまとめて探索したので、最短のフレーム数とは限りません)")
+    print("  inputs: " + " ".join(f"{name}x{count}" for name, count in result["inputs"]))
+    if not result["damage_free"]:
+        print("  ダメージ床を踏まずにはクリアできません")
+    if result["unavoidable_damage"]:
+        tiles = ", ".join(f"({x}, {y})" for x, y in result["unavoidable_damage"])
+        print(f"  避けられないダメージ床: {tiles}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="ステージをクリアできるかどうかを調べる")
+    parser.add_argument(
+        "stages", nargs="*",
+        help="maps/ 以下のステージファイル名 (省略した場合はすべて)")
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="並列に実行するプロセス数 (省略した場合は CPU コア数)")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="キャッシュを使わずにすべて調べ直す")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = solve_stages(
+        args.stages or stage_files(), args.jobs, not args.no_cache, print_result)
+    if not all(result["solvable"] for result in results.values()):
+        raise SystemExit(1)
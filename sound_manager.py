@@ -1,32 +1,159 @@
 import pygame
 import os
+import settings
+
+
+SE_DIR = os.path.join("assets", "se")
+
+
+def sound_files():
+    """assets/se ディレクトリの効果音の (名前, パス) の一覧"""
+    files = []
+    for filename in sorted(os.listdir(SE_DIR)):
+        if filename.endswith(".mp3") or filename.endswith(".wav"):
+            sound_name = os.path.splitext(filename)[0]  # 拡張子を除いたファイル名
+            files.append((sound_name, os.path.join(SE_DIR, filename)))
+    return files
+
+
+def _pcm_cache_path(sound_path):
+    # ミキサーの形式 (周波数・サンプルサイズ・チャンネル数) が違えば別のファイルにする
+    frequency, size, channels = pygame.mixer.get_init()
+    name = os.path.splitext(os.path.basename(sound_path))[0]
+    return os.path.join(
+        settings.SOUND_CACHE_DIR, f"{name}-{frequency}-{size}-{channels}.pcm")
+
+
+def load_sound(sound_path):
+    """効果音を読み込む (デコード済みの PCM をキャッシュし、次回からはそれを使う)
+
+    MP3 のデコードは遅いので、一度デコードしたサンプルを settings.SOUND_CACHE_DIR に
+    そのまま書き出しておく。元のファイルのほうが新しい場合はデコードし直す。
+    ミキサーを初期化してから呼ぶこと。
+    """
+    if not settings.USE_SOUND_CACHE:
+        return pygame.mixer.Sound(sound_path)
+
+    cache_path = _pcm_cache_path(sound_path)
+    try:
+        if os.path.getmtime(cache_path) >= os.path.getmtime(sound_path):
+            with open(cache_path, "rb") as f:
+                return pygame.mixer.Sound(buffer=f.read())
+    except OSError:
+        pass
+
+    sound = pygame.mixer.Sound(sound_path)
+    try:
+        os.makedirs(settings.SOUND_CACHE_DIR, exist_ok=True)
+        # 書きかけのファイルを読まないように、書き終えてから置き換える
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(sound.get_raw())
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"効果音キャッシュの書き込みエラー: {e}")
+    return sound
 
 
 class SoundManager:
-    def __init__(self):
+    """効果音を鳴らす
+
+    効果音はグループ (settings.SOUND_GROUPS) ごとに予約したチャンネルで鳴らし、
+    同時に鳴る数をグループのチャンネル数までに抑える。空きがなければ
+    一番前に鳴らしたものを止めて鳴らす。同じ効果音を
+    settings.SOUND_MIN_INTERVAL ミリ秒以内に続けて鳴らそうとした場合は
+    1回にまとめる (敵に何度も当たったときに "damage" が他の音をかき消さないように)。
+    """
+
+    def __init__(self, load=True):
         pygame.mixer.init()
         self.sounds = {}
-        self.load_sounds()
         self.volume = 1.0
+        self.last_played = {}  # sound_name -> 最後に鳴らした時刻 (ミリ秒)
+        self.channel_groups = self._reserve_channels()
+        self.channel_started = {}  # Channel -> 鳴らし始めた時刻 (ミリ秒)
+        # 統計 (鳴らした数・まとめた数・止めて鳴らした数)
+        self.played = 0
+        self.coalesced = 0
+        self.stolen = 0
+        # load が False なら、効果音は後から add_sound で登録する (非同期読み込み用)
+        if load:
+            self.load_sounds()
+
+    @staticmethod
+    def _reserve_channels():
+        """グループごとにチャンネルを予約し、group -> [Channel] を返す"""
+        total = sum(settings.SOUND_GROUP_CHANNELS.values())
+        # 予約していないチャンネルも残しておく (BGM など他の用途のため)
+        if pygame.mixer.get_num_channels() < total + 2:
+            pygame.mixer.set_num_channels(total + 2)
+        pygame.mixer.set_reserved(total)
+        groups = {}
+        index = 0
+        for group, count in settings.SOUND_GROUP_CHANNELS.items():
+            groups[group] = [pygame.mixer.Channel(index + i) for i in range(count)]
+            index += count
+        return groups
 
     def load_sounds(self):
         # assets/se ディレクトリから全ての効果音をロード
-        se_dir = os.path.join("assets", "se")
-        for filename in os.listdir(se_dir):
-            if filename.endswith(".mp3") or filename.endswith(".wav"):
-                sound_name = os.path.splitext(filename)[0]  # 拡張子を除いたファイル名
-                sound_path = os.path.join(se_dir, filename)
-                self.sounds[sound_name] = pygame.mixer.Sound(sound_path)
+        for sound_name, sound_path in sound_files():
+            self.add_sound(sound_name, load_sound(sound_path))
+
+    def add_sound(self, sound_name, sound):
+        sound.set_volume(self.volume)
+        self.sounds[sound_name] = sound
 
     def play(self, sound_name):
         """効果音を再生する"""
-        if sound_name in self.sounds:
-            self.sounds[sound_name].play()
-        else:
+        if sound_name not in self.sounds:
             print(f"警告: 効果音 '{sound_name}' が見つかりません")
+            return
+
+        now = pygame.time.get_ticks()
+        last = self.last_played.get(sound_name)
+        if last is not None and now - last < settings.SOUND_MIN_INTERVAL:
+            self.coalesced += 1
+            return
+        self.last_played[sound_name] = now
+
+        group = settings.SOUND_GROUPS.get(sound_name, settings.DEFAULT_SOUND_GROUP)
+        channel = self._find_channel(self.channel_groups[group])
+        channel.play(self.sounds[sound_name])
+        self.channel_started[channel] = now
+        self.played += 1
+
+    def _find_channel(self, channels):
+        for channel in channels:
+            if not channel.get_busy():
+                return channel
+        # 空きがなければ一番前に鳴らし始めたものを止める
+        self.stolen += 1
+        return min(channels, key=lambda channel: self.channel_started.get(channel, 0))
 
     def set_volume(self, volume):
         """全ての効果音のボリュームを設定する (0.0 〜 1.0)"""
         self.volume = max(0.0, min(volume, 1.0))
         for sound in self.sounds.values():
             sound.set_volume(self.volume)
+
+    def stats(self):
+        return {
+            "played": self.played,
+            "coalesced": self.coalesced,
+            "stolen": self.stolen,
+        }
+
+
+class NullSoundManager:
+    """音を鳴らさない SoundManager (ヘッドレス実行用)"""
+
+    def __init__(self):
+        self.sounds = {}
+        self.volume = 1.0
+
+    def play(self, sound_name):
+        pass
+
+    def set_volume(self, volume):
+        self.volume = max(0.0, min(volume, 1.0))
@@ -0,0 +1,117 @@
+import os
+from collections import OrderedDict
+import pygame
+import settings
+
+
+class SpriteSheetCache:
+    """プロセス全体で共有するスプライトシートのキャッシュ
+
+    (path, cols, rows) をキーに、デコード・分割済みのフレームリストを保持する。
+    返すリストは共有されるため、呼び出し側で変更しないこと。
+    """
+
+    _sheets = {}
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get_frames(cls, filename, cols, rows):
+        """スプライトシートを分割したフレームのリストを取得する"""
+        key = (os.path.abspath(filename), cols, rows)
+        frames = cls._sheets.get(key)
+        if frames is not None:
+            cls.hits += 1
+            return frames
+
+        cls.misses += 1
+        return cls.add_sheet(filename, cols, rows, pygame.image.load(filename))
+
+    @classmethod
+    def add_sheet(cls, filename, cols, rows, image):
+        """読み込み済みの画像 (別スレッドでデコードしたものなど) を分割して登録する"""
+        sheet = image.convert_alpha()
+        sprite_width = sheet.get_width() // cols
+        sprite_height = sheet.get_height() // rows
+        frames = []
+        for i in range(rows):
+            for j in range(cols):
+                rect = pygame.Rect(j * sprite_width, i * sprite_height, sprite_width, sprite_height)
+                frames.append(sheet.subsurface(rect))
+        cls._sheets[(os.path.abspath(filename), cols, rows)] = frames
+        return frames
+
+    @classmethod
+    def invalidate(cls, filename=None):
+        """キャッシュを破棄する (filename を省略した場合は全て)"""
+        if filename is None:
+            cls._sheets.clear()
+            return
+        path = os.path.abspath(filename)
+        for key in [key for key in cls._sheets if key[0] == path]:
+            del cls._sheets[key]
+
+    @classmethod
+    def stats(cls):
+        """キャッシュのヒット数・ミス数・保持しているシート数を返す"""
+        return {
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "sheets": len(cls._sheets),
+        }
+
+    @classmethod
+    def reset_stats(cls):
+        cls.hits = 0
+        cls.misses = 0
+
+
+class TransformCache:
+    """反転・拡大縮小・半透明化したフレームを保持する LRU キャッシュ
+
+    キーは (frame_index, flipped, size, alpha)。
+    同じ姿勢のスプライトを描き続ける間は transform もサーフェス確保も行わない。
+    """
+
+    def __init__(self, frames, max_size=None):
+        self.frames = frames
+        self.max_size = max_size if max_size is not None else settings.TRANSFORM_CACHE_SIZE
+        self._images = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, frame_index, flipped, size, alpha=None):
+        key = (frame_index, flipped, size, alpha)
+        image = self._images.get(key)
+        if image is not None:
+            self.hits += 1
+            self._images.move_to_end(key)
+            return image
+
+        self.misses += 1
+        image = self.frames[frame_index]
+        if flipped:
+            image = pygame.transform.flip(image, True, False)
+        image = pygame.transform.scale(image, size)
+        if alpha is not None:
+            # 半透明で描画するためのサーフェスを作成
+            alpha_image = pygame.Surface(size, pygame.SRCALPHA)
+            alpha_image.blit(image, (0, 0))
+            alpha_image.set_alpha(alpha)
+            image = alpha_image
+
+        self._images[key] = image
+        if len(self._images) > self.max_size:
+            self._images.popitem(last=False)
+        return image
+
+    def clear(self):
+        self._images.clear()
+
+    def __len__(self):
+        return len(self._images)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -1,5 +1,6 @@
 import pygame
 import settings
+from sprite_cache import SpriteSheetCache, TransformCache
 
 
 class SpriteWithFrames(pygame.sprite.Sprite):
@@ -24,19 +25,13 @@ class SpriteWithFrames(pygame.sprite.Sprite):
         self.previous_positions = []  # Store previous positions for motion blur
         self.max_blur_frames = 1      # Number of motion blur trailing images
         self.blur_opacity = 128       # Opacity of the blur trail (0-255)
+        # 反転・拡大縮小済みフレームのキャッシュ
+        self.transform_cache = TransformCache(self.frames)
 
     @staticmethod
     def _load_sprite_sheet(filename, cols, rows):
-        sheet = pygame.image.load(filename).convert_alpha()
-        sprite_width = sheet.get_width() // cols
-        sprite_height = sheet.get_height() // rows
-        sprites = []
-        for i in range(rows):
-            for j in range(cols):
-                rect = pygame.Rect(j * sprite_width, i * sprite_height, sprite_width, sprite_height)
-                frame = sheet.subsurface(rect)
-                sprites.append(frame)
-        return sprites
+        # 同じシートは一度だけデコードし、フレームリストを共有する
+        return SpriteSheetCache.get_frames(filename, cols, rows)
 
     def _frame_animation(self):
         now = pygame.time.get_ticks()
@@ -54,15 +49,25 @@ class SpriteWithFrames(pygame.sprite.Sprite):
                 if len(self.previous_positions) > self.max_blur_frames:
                     self.previous_positions.pop(0)
 
+    @staticmethod
+    def _scaled_size(rect, magnification_rate, is_player):
+        # プレイヤーの場合は横幅を固定する
+        if is_player:
+            return (settings.GRID_SIZE * 3, int(rect.height * magnification_rate))
+        return (int(rect.width * magnification_rate), int(rect.height * magnification_rate))
+
     def draw(
         self,
         magnification_rate=1,
         is_center=True,
         is_player=False,
+        offset=(0, 0),
     ):
         """
-        スプライトを描画する。
+        スプライトを描画する。offset はワールド座標から画面座標へのずれ。
+        描画した範囲 (残像を含む) の Rect のリストを返す。
         """
+        dirty_rects = []
         # Draw motion blur if enabled
         if self.has_motion_blur and self.previous_positions:
             # Draw previous frames with decreasing opacity
@@ -70,28 +75,13 @@ class SpriteWithFrames(pygame.sprite.Sprite):
                 # Calculate opacity for this blur frame
                 opacity = int(self.blur_opacity * (i + 1) / len(self.previous_positions))
 
-                # Get and process the frame image
-                blur_image = self.frames[old_frame_index]
-                if self.image_is_reverse:
-                    blur_image = pygame.transform.flip(blur_image, True, False)
-
-                # Scale the blur image
-                if is_player:
-                    player_width = settings.GRID_SIZE * 3
-                    scaled_height = int(old_rect.height * magnification_rate)
-                    blur_image = pygame.transform.scale(
-                        blur_image, (player_width, scaled_height))
-                else:
-                    scaled_width = int(old_rect.width * magnification_rate)
-                    scaled_height = int(old_rect.height * magnification_rate)
-                    blur_image = pygame.transform.scale(
-                        blur_image, (scaled_width, scaled_height))
-
-                # Create transparent surface for blur effect
-                blur_surface = pygame.Surface(
-                    blur_image.get_size(), pygame.SRCALPHA)
-                blur_surface.blit(blur_image, (0, 0))
-                blur_surface.set_alpha(opacity)
+                # Get the flipped, scaled and translucent frame from the cache
+                blur_surface = self.transform_cache.get(
+                    old_frame_index,
+                    self.image_is_reverse,
+                    self._scaled_size(old_rect, magnification_rate, is_player),
+                    opacity,
+                )
 
                 # Position the blur frame
                 blur_rect = blur_surface.get_rect()
@@ -101,24 +91,15 @@ class SpriteWithFrames(pygame.sprite.Sprite):
                     blur_rect.topleft = old_rect.topleft
 
                 # Draw the blur frame
-                self.surface.blit(blur_surface, blur_rect)
-
-        # ステップ1: 画像を必要に応じて反転（拡大縮小前に実行）
-        current_image = self.image
-        if self.image_is_reverse:
-            current_image = pygame.transform.flip(current_image, True, False)
+                dirty_rects.append(
+                    self.surface.blit(blur_surface, blur_rect.move(offset)))
 
-        # ステップ2: 画像を拡大縮小（プレイヤーの場合は特別処理）
-        if is_player:
-            player_width = settings.GRID_SIZE * 3
-            scaled_height = int(self.rect.height * magnification_rate)
-            draw_image = pygame.transform.scale(
-                current_image, (player_width, scaled_height))
-        else:
-            scaled_width = int(self.rect.width * magnification_rate)
-            scaled_height = int(self.rect.height * magnification_rate)
-            draw_image = pygame.transform.scale(
-                current_image, (scaled_width, scaled_height))
+        # ステップ1・2: 反転・拡大縮小済みの画像をキャッシュから取得
+        draw_image = self.transform_cache.get(
+            self.frame_index,
+            self.image_is_reverse,
+            self._scaled_size(self.rect, magnification_rate, is_player),
+        )
 
         # ステップ3: 描画位置の設定（画像サイズから新しいRectを作成）
         draw_rect = draw_image.get_rect()
@@ -127,13 +108,15 @@ class SpriteWithFrames(pygame.sprite.Sprite):
             draw_rect.center = self.rect.center
         else:
             draw_rect.topleft = self.rect.topleft
+        draw_rect.move_ip(offset)
 
         # ステップ4: 描画を実行
-        self.surface.blit(draw_image, draw_rect)
+        dirty_rects.append(self.surface.blit(draw_image, draw_rect))
 
         # ステップ5: デバッグモード時の表示
         if settings.IS_DEBUG_MODE:
             pygame.draw.rect(
                 self.surface, settings.COLORS["red"], draw_rect, 2)
             pygame.draw.rect(
-                self.surface, settings.COLORS["blue"], self.rect, 2)
+                self.surface, settings.COLORS["blue"], self.rect.move(offset), 2)
+        return dirty_rects
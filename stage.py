@@ -1,75 +1,163 @@
-from player import Player
+from player import Player, START_POS
 from map import Map
 from ui import UI
 from background import Background
+from camera import Camera
 from enemy import Enemy
+from enemy_system import EnemySystem
 import random
 import pygame
 import settings
 import pygame_music_materials as pmm
+from profiler import profiler
+
+ENEMY_SPAWN_INTERVAL = 60  # 敵を生成する間隔 (フレーム数)
+
+
+def _lerp_delta(previous, current, alpha):
+    """current から、previous と current を alpha で補間した位置までのずれ"""
+    return round((previous - current) * (1.0 - alpha))
 
 
 class Stage:
-    def __init__(self, surface, stage_file_name, mixer, sound_manager):
+    def __init__(self, surface, stage_file_name, mixer, sound_manager, get_pressed=None, seed=None,
+                 use_enemy_system=None, render=True):
         self.surface = surface
-        self.map = Map(self.surface)
+        # render が False なら、draw を呼ぶまで地形の描画レイヤーを作らない (ヘッドレスの大量実行用)
+        self.map = Map(self.surface, render)
         self.player = None
-        self.ui = None
         self.stage_file_name = stage_file_name
         self.is_clear = False
+        # 背景・UI・カメラはステージが変わっても作り直さない
         self.background = Background(self.surface)
+        self.ui = UI(self.surface, self.player, self.map)
+        self.camera = Camera()
         self.mixer = mixer
         self.sound_manager = sound_manager
-        self.enemies = []
+        self.get_pressed = get_pressed
+        # 敵を EnemySystem でまとめて更新するか、Enemy のリストで1体ずつ更新するか
+        if use_enemy_system is None:
+            use_enemy_system = settings.USE_ENEMY_SYSTEM
+        self.use_enemy_system = use_enemy_system
+        self.enemies = self._make_enemies()
         self.enemy_spawn_timer = 0
-        self.enemy_spawn_interval = 60  # 60フレームごとに敵を生成
+        self.enemy_spawn_interval = ENEMY_SPAWN_INTERVAL
+        self.max_enemies = None  # 同時に出す敵の上限 (None なら無制限)
+        self.draw_background = True  # False なら背景を描かない (QualityGovernor が変更する)
+        self.rng = random.Random(seed)  # 敵の出現位置を決める乱数 (リプレイ用にシード指定可)
         self.clear_timer = 0  # クリア後の時間を計測するタイマー
         self.clear_delay = 200  # クリア音楽が鳴り終わるまでの待機フレーム数（約2秒）
         self.is_clearing = False  # クリア演出中かどうか
+        self._reset_stats()
         self.reset()
 
+    def load(self, stage_file_name, seed=None):
+        """別のステージに切り替える"""
+        self.stage_file_name = stage_file_name
+        self.rng = random.Random(seed)
+        self.enemy_spawn_timer = 0
+        self._reset_stats()
+        self.reset()
+
+    def _reset_stats(self):
+        # ステージ中に受けたダメージの原因別の合計とやられた回数 (やり直しても数え続ける)
+        self.damage_taken = {"enemy": 0, "terrain": 0, "fall": 0}
+        self.deaths = 0
+
     # マップの初期化
     def reset(self):
         self.map.load_map(self.stage_file_name)
         self.player = Player(self.surface, self.map,
-                             (30, 30), self.sound_manager)
-        self.ui = UI(self.surface, self.player, self.map)
-        self.enemies = []
+                             START_POS, self.sound_manager, self.get_pressed)
+        self._update_camera()
+        self.ui.player = self.player
+        self._save_previous_positions()
+        self.enemies = self._make_enemies()
         self.clear_timer = 0
         self.is_clearing = False
         self.is_clear = False
 
+    def _update_camera(self):
+        # プレイヤーを追いかけ、画面付近のチャンクだけを読み込んでおく
+        self.camera.follow(
+            self.player.rect, self.map.pixel_width, self.map.pixel_height)
+        with profiler.section("Map.stream"):
+            self.map.update_active_chunks(self.camera.rect)
+
+    def _make_enemies(self):
+        if self.use_enemy_system:
+            return EnemySystem(self.surface)
+        return []
+
     def spawn_enemy(self):
-        x = random.randint(0, settings.WIDTH - 20)
-        y = -20  # 画面外から開始
-        self.enemies.append(Enemy(self.surface, x, y))
+        x = self.rng.randint(0, settings.WIDTH - 20) + self.camera.rect.x
+        y = self.camera.rect.y - 20  # 画面外から開始
+        if self.use_enemy_system:
+            self.enemies.spawn(x, y)
+        else:
+            self.enemies.append(Enemy(self.surface, x, y))
+
+    def _save_previous_positions(self):
+        # 描画の補間に使う、更新前の位置を記録する
+        self.prev_camera_pos = self.camera.rect.topleft
+        self.prev_player_pos = self.player.rect.topleft
+
+    def _stop_enemy_interpolation(self):
+        # 更新しないフレームで敵が補間によって揺れないよう、前回の位置を今の位置に合わせる
+        if self.use_enemy_system:
+            self.enemies.prev_x = self.enemies.x
+            self.enemies.prev_y = self.enemies.y
+        else:
+            for enemy in self.enemies:
+                enemy.prev_x = enemy.x
+                enemy.prev_y = enemy.y
 
     def update(self):
+        self._save_previous_positions()
         # クリア演出中なら
         if self.is_clearing:
+            self._stop_enemy_interpolation()
             self.clear_timer += 1
             if self.clear_timer >= self.clear_delay:
                 self.is_clear = True  # ステージクリアフラグを立てる
             return
 
-        self.player.update()
+        hp = self.player.hp
+        with profiler.section("Player.update"):
+            self.player.update()
+        if self.player.hp < hp:
+            cause = "fall" if self.player.rect.y > self.map.pixel_height else "terrain"
+            self.damage_taken[cause] += hp - self.player.hp
+        self._update_camera()
 
         # 敵の更新
         self.enemy_spawn_timer += 1
         if self.enemy_spawn_timer >= self.enemy_spawn_interval:
-            self.spawn_enemy()
+            if self.max_enemies is None or len(self.enemies) < self.max_enemies:
+                self.spawn_enemy()
             self.enemy_spawn_timer = 0
 
-        for enemy in self.enemies[:]:
-            enemy.update(self.map, self.player)  # playerを渡す
-            if enemy.is_out_of_screen():
-                self.enemies.remove(enemy)
-            elif pygame.Rect.colliderect(enemy.rect, self.player.rect):
+        if self.use_enemy_system:
+            with profiler.section("Enemy.update"):
+                hit_count = self.enemies.update(self.map, self.player)
+            self.damage_taken["enemy"] += hit_count
+            for _ in range(hit_count):
                 self.player.hp -= 1  # HPを1減らす
                 self.sound_manager.play("damage")  # ダメージ効果音の再生
-                self.enemies.remove(enemy)
+        else:
+            for enemy in self.enemies[:]:
+                with profiler.section("Enemy.update"):
+                    enemy.update(self.map, self.player)  # playerを渡す
+                if enemy.is_out_of_screen(self.map.pixel_height):
+                    self.enemies.remove(enemy)
+                elif pygame.Rect.colliderect(enemy.rect, self.player.rect):
+                    self.player.hp -= 1  # HPを1減らす
+                    self.damage_taken["enemy"] += 1
+                    self.sound_manager.play("damage")  # ダメージ効果音の再生
+                    self.enemies.remove(enemy)
 
         if self.player.hp <= 0:
+            self.deaths += 1
             self.reset()
         if self.player.is_clear and not self.is_clearing:
             self.start_clear_sequence()
@@ -85,10 +173,41 @@ class Stage:
         self.is_clearing = True  # クリア演出中フラグを立てる
         self.clear_timer = 0
 
-    def draw(self):
-        self.background.draw()
-        self.map.draw()
-        for enemy in self.enemies:
-            enemy.draw()
-        self.player.draw()
-        self.ui.draw()
+    def view_offset(self, alpha=1.0):
+        """補間したカメラの位置から求めた、ワールド座標から画面座標へのずれ"""
+        camera_x = self.camera.rect.x + _lerp_delta(
+            self.prev_camera_pos[0], self.camera.rect.x, alpha)
+        camera_y = self.camera.rect.y + _lerp_delta(
+            self.prev_camera_pos[1], self.camera.rect.y, alpha)
+        return (-camera_x, -camera_y)
+
+    def draw(self, alpha=1.0):
+        """alpha は前回の更新から今回の更新までの補間の割合 (1.0 なら今の位置)"""
+        offset = self.view_offset(alpha)
+        self.draw_static(offset)
+        self.draw_dynamic(offset, alpha)
+
+    def draw_static(self, offset):
+        """カメラが動かない限り変わらないもの (背景・地形) を描画する"""
+        if self.draw_background:
+            with profiler.section("Background.draw"):
+                self.background.draw()
+        else:
+            # 前のフレームの絵が残らないように塗りつぶす
+            self.surface.fill(settings.COLORS["black"])
+        with profiler.section("Map.draw"):
+            self.map.draw(offset)
+
+    def draw_dynamic(self, offset, alpha=1.0):
+        """毎フレーム変わりうるもの (敵・プレイヤー・UI) を描画し、描画した範囲の Rect のリストを返す"""
+        if self.use_enemy_system:
+            dirty_rects = self.enemies.draw(offset, alpha)
+        else:
+            dirty_rects = [enemy.draw(offset, alpha) for enemy in self.enemies]
+        dirty_rects += self.player.draw((
+            offset[0] + _lerp_delta(self.prev_player_pos[0], self.player.rect.x, alpha),
+            offset[1] + _lerp_delta(self.prev_player_pos[1], self.player.rect.y, alpha),
+        ))
+        with profiler.section("UI.draw"):
+            dirty_rects += self.ui.draw()
+        return dirty_rects
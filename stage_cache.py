@@ -0,0 +1,79 @@
+import json
+import os
+import worker
+from stage_format import is_binary_stage, read_stage_tiles, to_stage_tiles
+
+MAPS_DIR = os.path.join(os.path.dirname(__file__), "maps")
+
+
+def load_stage_file(filename):
+    """maps/ 以下のステージファイル (JSON・バイナリ形式) を読み込む
+
+    (ステージ名, 幅, 高さ, 行優先の地形番号の bytes) を返す。
+    """
+    file_path = os.path.join(MAPS_DIR, filename)
+    if is_binary_stage(file_path):
+        return read_stage_tiles(file_path)
+    with open(file_path, "r") as f:
+        return to_stage_tiles(json.load(f))
+
+
+class StageCache:
+    """プロセス全体で共有するステージファイルのキャッシュ
+
+    各ステージは一度だけ読み込み、load_stage_file の (ステージ名, 幅, 高さ, 地形番号) を保持する。
+    地形番号は変更できない bytes なので、呼び出し側で共有しても書き換わらない。
+    """
+
+    _stages = {}  # filename -> (map_name, width, height, tiles)
+    _pending = {}  # filename -> 先読み中の Future
+    hits = 0
+    misses = 0
+
+    @classmethod
+    def get(cls, filename):
+        """ステージの (ステージ名, 幅, 高さ, 地形番号) を返す (先読み中なら終わるまで待つ)"""
+        stage = cls._stages.get(filename)
+        if stage is not None:
+            cls.hits += 1
+            return stage
+
+        future = cls._pending.pop(filename, None)
+        if future is not None:
+            cls.hits += 1
+            stage = future.result()
+        else:
+            cls.misses += 1
+            stage = load_stage_file(filename)
+        cls._stages[filename] = stage
+        return stage
+
+    @classmethod
+    def prefetch(cls, filename):
+        """ステージの読み込みをワーカースレッドで始めておく"""
+        if filename in cls._stages or filename in cls._pending:
+            return
+        cls._pending[filename] = worker.submit(load_stage_file, filename)
+
+    @classmethod
+    def invalidate(cls, filename=None):
+        """キャッシュを破棄する (filename を省略した場合は全て)"""
+        # 先読み中のものは古い内容を読んでいるかもしれないので、まだ始まっていなければ取り消す
+        if filename is None:
+            cls._stages.clear()
+            for future in cls._pending.values():
+                future.cancel()
+            cls._pending.clear()
+            return
+        cls._stages.pop(filename, None)
+        future = cls._pending.pop(filename, None)
+        if future is not None:
+            future.cancel()
+
+    @classmethod
+    def stats(cls):
+        return {
+            "hits": cls.hits,
+            "misses": cls.misses,
+            "stages": len(cls._stages),
+        }
@@ -0,0 +1,239 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import zlib
+import settings
+
+# ファイル形式: ヘッダー + ステージ名 (UTF-8) + 地形番号の配列 (1マス1バイト・行優先)
+# 地形番号の配列は圧縮方式に応じてそのまま・RLE・zlib のいずれかで格納する
+MAGIC = b"KRST"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHHH")  # magic, version, compression, width, height, name_length
+BINARY_EXTENSION = ".stage"
+
+COMPRESSIONS = {"none": 0, "rle": 1, "zlib": 2}
+_COMPRESSION_NAMES = {code: name for name, code in COMPRESSIONS.items()}
+
+
+def is_binary_stage(path):
+    return path.endswith(BINARY_EXTENSION)
+
+
+def encode_rle(data):
+    """(連続数, 値) の2バイトの組の並びに変換する (連続数は最大255)"""
+    encoded = bytearray()
+    i = 0
+    while i < len(data):
+        value = data[i]
+        run = 1
+        while i + run < len(data) and run < 255 and data[i + run] == value:
+            run += 1
+        encoded += bytes((run, value))
+        i += run
+    return bytes(encoded)
+
+
+def decode_rle(data):
+    return b"".join(
+        bytes((value,)) * run for run, value in zip(data[0::2], data[1::2]))
+
+
+def to_tile_grid(map_data):
+    """map_data (2次元リスト形式・チャンク形式のどちらか) を1マス1バイトの配列にする
+
+    (width, height, 行優先で width * height 個の地形番号の bytearray) を返す。
+    チャンク形式: {"map_name", "width", "height", "chunk_size",
+                   "chunks": {"x,y": chunk_size 四方の地形番号}}
+    """
+    if "chunks" not in map_data:
+        rows = map_data["map_data"]
+        width = max((len(row) for row in rows), default=0)
+        height = len(rows)
+        tiles = bytearray(width * height)
+        for y, row in enumerate(rows):
+            tiles[y * width:y * width + len(row)] = bytes(row)
+        return width, height, tiles
+
+    chunk_size = map_data["chunk_size"]
+    width = map_data["width"]
+    height = map_data["height"]
+    tiles = bytearray(width * height)
+    for key, chunk in map_data["chunks"].items():
+        chunk_x, chunk_y = (int(v) for v in key.split(","))
+        base_x = chunk_x * chunk_size
+        base_y = chunk_y * chunk_size
+        # チャンクはマップの端で chunk_size に満たない分が 0 で埋められている
+        count = min(chunk_size, width - base_x)
+        for y, row in enumerate(chunk[:height - base_y]):
+            start = (base_y + y) * width + base_x
+            tiles[start:start + count] = bytes(row[:count])
+    return width, height, tiles
+
+
+def to_stage_tiles(map_data):
+    """map_data (2次元リスト形式・チャンク形式のどちらか) を
+    (ステージ名, 幅, 高さ, 行優先の地形番号の bytes) にする (StageCache が保持する形式)
+    """
+    width, height, tiles = to_tile_grid(map_data)
+    return map_data["map_name"], width, height, bytes(tiles)
+
+
+def occupied_chunks(width, height, tiles, chunk_size=settings.CHUNK_SIZE):
+    """地形のあるチャンクの (chunk_x, chunk_y) の集合を返す"""
+    keys = set()
+    for top in range(0, height, chunk_size):
+        # チャンク1段分の行を OR でまとめ、0 でないマスのある列を1回で調べる
+        combined = 0
+        for y in range(top, min(top + chunk_size, height)):
+            combined |= int.from_bytes(tiles[y * width:(y + 1) * width], "big")
+        if not combined:
+            continue
+        row = combined.to_bytes(width, "big")
+        chunk_y = top // chunk_size
+        for start in range(0, width, chunk_size):
+            if row[start:start + chunk_size].strip(b"\0"):
+                keys.add((start // chunk_size, chunk_y))
+    return keys
+
+
+def write_stage(path, map_name, rows, compression="zlib"):
+    """2次元の地形リストをバイナリ形式で保存する"""
+    width = max((len(row) for row in rows), default=0)
+    height = len(rows)
+    tiles = bytearray(width * height)
+    for y, row in enumerate(rows):
+        tiles[y * width:y * width + len(row)] = bytes(row)
+
+    if compression == "rle":
+        payload = encode_rle(tiles)
+    elif compression == "zlib":
+        payload = zlib.compress(bytes(tiles), 9)
+    elif compression == "none":
+        payload = bytes(tiles)
+    else:
+        raise ValueError(f"未対応の圧縮方式です: {compression}")
+
+    name = map_name.encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(
+            MAGIC, VERSION, COMPRESSIONS[compression], width, height, len(name)))
+        f.write(name)
+        f.write(payload)
+
+
+def _read_header(data, path):
+    magic, version, compression, width, height, name_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"ステージファイルではありません: {path}")
+    if version != VERSION:
+        raise ValueError(f"未対応のステージバージョンです: {version}")
+    if compression not in _COMPRESSION_NAMES:
+        raise ValueError(f"未対応の圧縮方式です: {compression}")
+    name_end = HEADER.size + name_length
+    map_name = bytes(data[HEADER.size:name_end]).decode("utf-8")
+    return _COMPRESSION_NAMES[compression], width, height, map_name, name_end
+
+
+def _read_tiles(path):
+    """(ステージ名, 幅, 高さ, 地形番号の配列) を返す
+
+    圧縮なしのファイルはメモリマップしてそのまま返すので、読み込みでコピーしない。
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"ステージファイルではありません: {path}")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    tiles = None
+    try:
+        compression, width, height, map_name, offset = _read_header(data, path)
+        if compression == "none":
+            tiles = memoryview(data)[offset:]
+        else:
+            payload = data[offset:]
+            data.close()
+            if compression == "rle":
+                tiles = decode_rle(payload)
+            else:
+                tiles = zlib.decompress(payload)
+        if len(tiles) != width * height:
+            raise ValueError(f"ステージファイルが壊れています: {path}")
+    except (ValueError, struct.error, zlib.error) as error:
+        # 失敗したらメモリマップを閉じ、ヘッダーや圧縮の壊れも ValueError にする
+        if isinstance(tiles, memoryview):
+            tiles.release()
+        data.close()
+        if isinstance(error, ValueError):
+            raise
+        raise ValueError(f"ステージファイルが壊れています: {path}") from error
+    return map_name, width, height, tiles
+
+
+def _close_tiles(tiles):
+    # メモリマップしたファイルを閉じる
+    if isinstance(tiles, memoryview):
+        data = tiles.obj
+        tiles.release()
+        data.close()
+
+
+def read_stage_tiles(path):
+    """バイナリ形式のステージを (ステージ名, 幅, 高さ, 行優先の地形番号の bytes) として読み込む
+
+    地形はリストに展開せず、ファイルの地形番号の配列をそのまま (圧縮なしならメモリマップから
+    1回コピーするだけで) 返す。
+    """
+    map_name, width, height, tiles = _read_tiles(path)
+    if isinstance(tiles, memoryview):
+        data = bytes(tiles)
+        _close_tiles(tiles)
+        tiles = data
+    return map_name, width, height, tiles
+
+
+def read_stage_rows(path):
+    """バイナリ形式のステージを JSON と同じ {"map_name", "map_data"} 形式で読み込む"""
+    map_name, width, height, tiles = _read_tiles(path)
+    rows = [list(tiles[y * width:(y + 1) * width]) for y in range(height)]
+    _close_tiles(tiles)
+    return {"map_name": map_name, "map_data": rows}
+
+
+def convert(src, dst=None, compression="zlib"):
+    """JSON とバイナリ形式を相互に変換する (拡張子で向きを決める)"""
+    if is_binary_stage(src):
+        dst = dst or os.path.splitext(src)[0] + ".json"
+        with open(dst, "w") as f:
+            json.dump(read_stage_rows(src), f, ensure_ascii=False, indent=4)
+    else:
+        dst = dst or os.path.splitext(src)[0] + BINARY_EXTENSION
+        with open(src, "r") as f:
+            map_data = json.load(f)
+        write_stage(dst, map_data["map_name"], map_data["map_data"], compression)
+    return dst
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="ステージファイルを JSON とバイナリ形式 (.stage) で相互に変換する")
+    parser.add_argument(
+        "files", nargs="+",
+        help="変換するファイル (.json ならバイナリに、.stage なら JSON に変換)")
+    parser.add_argument(
+        "-o", "--output", metavar="FILE",
+        help="出力先 (ファイルを1つだけ指定した場合のみ)")
+    parser.add_argument(
+        "--compression", choices=list(COMPRESSIONS), default="zlib",
+        help="バイナリに変換するときの圧縮方式")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.output and len(args.files) > 1:
+        raise SystemExit("--output はファイルを1つだけ指定した場合に使えます")
+    for src in args.files:
+        dst = convert(src, args.output, args.compression)
+        print(f"{src} ({os.path.getsize(src)} bytes) -> "
+              f"{dst} ({os.path.getsize(dst)} bytes)")
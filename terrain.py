@@ -1,4 +1,4 @@
-# import pygame
+import pygame
 import settings
 from sprite_with_frames import SpriteWithFrames
 
@@ -23,6 +23,12 @@ terrain_indexes = {
     9: 215,
 }
 
+# 地形番号ごとの性質 (地形番号をそのまま添字にする。0 は何もないマス)
+TILE_TYPE_COUNT = 256
+TILE_DAMAGE = bytes(1 if color in (6, 7, 8) else 0 for color in range(TILE_TYPE_COUNT))
+TILE_GOAL = bytes(1 if color == 9 else 0 for color in range(TILE_TYPE_COUNT))
+TILE_SOLID = bytes(1 if color != 0 else 0 for color in range(TILE_TYPE_COUNT))
+
 TERRAIN_IMAGE_URL = "./assets/images/terrain.png"
 TERRAIN_IMAGE_SIZE = 16
 TERRAIN_WIDTH = 22
@@ -41,30 +47,56 @@ class Terrain(SpriteWithFrames):
             sprite_height=TERRAIN_IMAGE_SIZE,
             image_is_reverse=False,
         )
+        # rectを2倍のサイズにする
+        self.rect.width = settings.GRID_SIZE
+        self.rect.height = settings.GRID_SIZE
+        self.move_to(grid_x, grid_y)
+        self.set_terrain_color(terrain_color)
+
+    def move_to(self, grid_x, grid_y):
+        """作り直さずに別のマスへ移動する"""
         self.grid_x = grid_x
         self.grid_y = grid_y
         self.rect.x = grid_x * settings.GRID_SIZE
         self.rect.y = grid_y * settings.GRID_SIZE
-        # rectを2倍のサイズにする
-        self.rect.width = settings.GRID_SIZE
-        self.rect.height = settings.GRID_SIZE
+
+    def set_terrain_color(self, terrain_color):
+        """作り直さずに地形の種類を変更する"""
+        self.terrain_color = terrain_color
         self.color = terrain_indexes[terrain_color]
-        self.image = self.frames[self.color]
+        self.frame_index = self.color
+        self.image = self.frames[self.frame_index]
         self.damage = self.set_terrain_damage(terrain_color)
         self.is_goal = self.set_terrain_goal(terrain_color)
 
     def draw(self):
-        super().draw(
+        return super().draw(
             magnification_rate=1,
             is_center=False,
         )
 
     def set_terrain_damage(self, terrain_color):
-        if terrain_color in [6, 7, 8]:
-            return 1
-        return 0
+        return TILE_DAMAGE[terrain_color]
 
     def set_terrain_goal(self, terrain_color):
-        if terrain_color == 9:
-            return True
-        return False
+        return bool(TILE_GOAL[terrain_color])
+
+
+class Tile:
+    """当たり判定で返す1マス分の地形
+
+    地形は Map が地形番号の配列として持ち、Tile は当たり判定などで
+    必要になったマスの分だけ作る。
+    """
+
+    __slots__ = ("grid_x", "grid_y", "terrain_color", "rect", "damage", "is_goal")
+
+    def __init__(self, grid_x, grid_y, terrain_color):
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        self.terrain_color = terrain_color
+        self.rect = pygame.Rect(
+            grid_x * settings.GRID_SIZE, grid_y * settings.GRID_SIZE,
+            settings.GRID_SIZE, settings.GRID_SIZE)
+        self.damage = TILE_DAMAGE[terrain_color]
+        self.is_goal = bool(TILE_GOAL[terrain_color])
@@ -0,0 +1,36 @@
+import os
+import sys
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from player import START_POS  # noqa: E402
+from vector_env import VectorStageEnv  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _chdir_to_repo(monkeypatch):
+    # マップや画像は作業ディレクトリからの相対パスで読み込まれる
+    monkeypatch.chdir(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def test_auto_reset_returns_first_observation_of_next_episode():
+    env = VectorStageEnv(num_envs=2, seed=0, max_episode_steps=50)
+    env.reset()
+    right = 2  # ACTIONS の (K_RIGHT,)
+    for _ in range(49):
+        obs, rewards, terminated, truncated, infos = env.step([right, right])
+        assert not (terminated | truncated).any()
+    obs, rewards, terminated, truncated, infos = env.step([right, right])
+
+    assert truncated.all()
+    final = infos["final_observation"]["player"]
+    # 終わった時点の観測は右に進んだ位置、返す観測は次のエピソードの最初の位置
+    assert (final[:, 0] > START_POS[0]).all()
+    assert obs["player"][:, 0].tolist() == [START_POS[0]] * 2
+    assert obs["player"][:, 1].tolist() == [START_POS[1]] * 2
+    assert (env.episode_steps == 0).all()
+    env.close()
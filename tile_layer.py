@@ -0,0 +1,105 @@
+import pygame
+import settings
+from sprite_cache import SpriteSheetCache
+from terrain import (
+    terrain_indexes,
+    TERRAIN_IMAGE_URL,
+    TERRAIN_WIDTH,
+    TERRAIN_HEIGHT,
+)
+
+
+class TileLayer:
+    """地形をチャンク単位のサーフェスに焼き込んでおく描画レイヤー
+
+    地形は動かないので、マップ読み込み時に一度だけ描画しておき、
+    毎フレームはチャンクを blit するだけにする。
+    タイルが変わった場合は set_tile でそのマスだけ描き直す。
+    """
+
+    def __init__(self):
+        self.chunks = {}  # (chunk_x, chunk_y) -> Surface
+        self.frames = SpriteSheetCache.get_frames(
+            TERRAIN_IMAGE_URL, TERRAIN_WIDTH, TERRAIN_HEIGHT)
+        # terrain_color -> GRID_SIZE に拡大済みの画像
+        # ワーカースレッドの render_chunk からも読むので、ここ (メインスレッド) で
+        # すべて作っておき、あとから書き換えない
+        self.tile_images = {
+            terrain_color: pygame.transform.scale(
+                self.frames[index], (settings.GRID_SIZE, settings.GRID_SIZE))
+            for terrain_color, index in terrain_indexes.items()
+        }
+
+    def build(self, map_data):
+        """2次元の地形リストからすべてのチャンクを作り直す"""
+        self.chunks = {}
+        for y, row in enumerate(map_data):
+            for x, cell in enumerate(row):
+                if cell == 0:  # 0は何もないタイル
+                    continue
+                self._blit_tile(x, y, cell)
+
+    def render_chunk(self, tiles):
+        """1チャンク分 (settings.CHUNK_SIZE 四方の地形番号) を新しいサーフェスに描く
+
+        self.chunks を変更せず、tile_images は読むだけなので、ワーカースレッドからも呼べる。
+        """
+        chunk_pixels = settings.CHUNK_SIZE * settings.GRID_SIZE
+        image = pygame.Surface((chunk_pixels, chunk_pixels), pygame.SRCALPHA)
+        for y, row in enumerate(tiles):
+            for x, cell in enumerate(row):
+                if cell == 0:  # 0は何もないタイル
+                    continue
+                image.blit(self.tile_images[cell], self._cell_rect(x, y))
+        return image
+
+    def set_chunk(self, chunk_key, image):
+        """render_chunk で描いたサーフェスを表示する"""
+        self.chunks[chunk_key] = image
+
+    def drop_chunk(self, chunk_key):
+        """画面から離れたチャンクのサーフェスを手放す"""
+        self.chunks.pop(chunk_key, None)
+
+    def clear(self):
+        self.chunks = {}
+
+    def set_tile(self, grid_x, grid_y, terrain_color):
+        """1マスだけ描き直す"""
+        chunk = self.chunks.get(self._chunk_key(grid_x, grid_y))
+        if chunk is not None:
+            chunk.fill((0, 0, 0, 0), self._cell_rect(grid_x, grid_y))
+        if terrain_color != 0:
+            self._blit_tile(grid_x, grid_y, terrain_color)
+
+    def draw(self, surface, offset=(0, 0)):
+        chunk_pixels = settings.CHUNK_SIZE * settings.GRID_SIZE
+        for (chunk_x, chunk_y), chunk in self.chunks.items():
+            surface.blit(chunk, (
+                chunk_x * chunk_pixels + offset[0],
+                chunk_y * chunk_pixels + offset[1],
+            ))
+
+    def _blit_tile(self, grid_x, grid_y, terrain_color):
+        key = self._chunk_key(grid_x, grid_y)
+        chunk = self.chunks.get(key)
+        if chunk is None:
+            chunk_pixels = settings.CHUNK_SIZE * settings.GRID_SIZE
+            chunk = pygame.Surface((chunk_pixels, chunk_pixels), pygame.SRCALPHA)
+            self.chunks[key] = chunk
+        chunk.blit(self.tile_images[terrain_color],
+                   self._cell_rect(grid_x, grid_y))
+
+    @staticmethod
+    def _chunk_key(grid_x, grid_y):
+        return (grid_x // settings.CHUNK_SIZE, grid_y // settings.CHUNK_SIZE)
+
+    @staticmethod
+    def _cell_rect(grid_x, grid_y):
+        # チャンク内でのマスの位置
+        return pygame.Rect(
+            (grid_x % settings.CHUNK_SIZE) * settings.GRID_SIZE,
+            (grid_y % settings.CHUNK_SIZE) * settings.GRID_SIZE,
+            settings.GRID_SIZE,
+            settings.GRID_SIZE,
+        )
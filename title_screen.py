@@ -2,31 +2,49 @@ import pygame
 import settings
 import time
 from math import sin
+from font_cache import FontCache
+
+TITLE_FONT_SIZE = 32
+LOADING_BAR_WIDTH = 240
+LOADING_BAR_HEIGHT = 8
 
 
 class TitleScreen:
     def __init__(self, surface):
         self.surface = surface
-        self.font = pygame.font.Font("PixelMplus12-Regular.ttf", 32)
-        self.start_time = time.time()
-
-    def draw(self):
-        title_text = self.font.render(
-            settings.TITLE, True, settings.COLORS["white"])
-        start_text = self.font.render(
-            "Press Space Key", True, settings.COLORS["white"])
-
-        title_rect = title_text.get_rect(
+        self.title_text = FontCache.render(
+            settings.TITLE, TITLE_FONT_SIZE, settings.COLORS["white"])
+        # 点滅させるために set_alpha を変更するので、共有のキャッシュからコピーしておく
+        self.start_text = FontCache.render(
+            "Press Space Key", TITLE_FONT_SIZE, settings.COLORS["white"]).copy()
+        self.title_rect = self.title_text.get_rect(
             center=(settings.WIDTH // 2, settings.HEIGHT // 2 - 50)
         )
-        start_rect = start_text.get_rect(
+        self.start_rect = self.start_text.get_rect(
             center=(settings.WIDTH // 2, settings.HEIGHT // 2 + 50)
         )
+        self.loading_text = FontCache.render(
+            "Loading...", TITLE_FONT_SIZE, settings.COLORS["white"])
+        self.loading_rect = self.loading_text.get_rect(
+            center=(settings.WIDTH // 2, settings.HEIGHT // 2 + 50)
+        )
+        self.start_time = time.time()
+
+    def draw(self, loading_progress=None):
+        """タイトル画面を描画する (loading_progress が None でなければ読み込みの進み具合を表示する)"""
+        self.surface.blit(self.title_text, self.title_rect)
 
-        self.surface.blit(title_text, title_rect)
+        if loading_progress is not None:
+            self.surface.blit(self.loading_text, self.loading_rect)
+            bar_rect = pygame.Rect(0, 0, LOADING_BAR_WIDTH, LOADING_BAR_HEIGHT)
+            bar_rect.midtop = (self.loading_rect.centerx, self.loading_rect.bottom + 10)
+            pygame.draw.rect(self.surface, settings.COLORS["white"], bar_rect, 1)
+            bar_rect.width = int(LOADING_BAR_WIDTH * loading_progress)
+            pygame.draw.rect(self.surface, settings.COLORS["white"], bar_rect)
+            return
 
         # 点滅効果の計算
         elapsed_time = time.time() - self.start_time
         alpha = int((1 + sin(elapsed_time * 3)) * 127 + 128)  # 0-255の範囲で点滅
-        start_text.set_alpha(alpha)
-        self.surface.blit(start_text, start_rect)
+        self.start_text.set_alpha(alpha)
+        self.surface.blit(self.start_text, self.start_rect)
@@ -1,5 +1,8 @@
 import pygame
 import settings
+from font_cache import FontCache
+from sprite_cache import SpriteSheetCache
+from stage_cache import StageCache
 
 PLAYER_HP_POSITION = (10, 60)
 STAGE_NAME_POSITION = (10, 10)
@@ -10,22 +13,30 @@ HP_BAR_BORDER_WIDTH = 2
 # HP Bar color constants
 HP_COLOR_MAX = (0, 255, 0)  # Green for max health
 HP_COLOR_MIN = (255, 0, 0)  # Red for low health
+STAGE_NAME_FONT_SIZE = 30
+# Debug info constants
+DEBUG_INFO_POSITION = (10, 90)
+DEBUG_FONT_SIZE = 16
 
 
 class UI():
     def __init__(self, surface, player, map):
         self.surface = surface
-        self.font = pygame.font.Font(f"./{settings.FONT_FILE_NAME}", 30)
+        # デバッグ表示は毎フレーム内容が変わるのでテキストのキャッシュを使わない
+        self.debug_font = FontCache.get_font(DEBUG_FONT_SIZE)
         self.player = player
         self.map = map
 
     def draw(self):
-        self.draw_player_ui()
-        self.draw_stage_name()
+        """UI を描画し、描画した範囲の Rect のリストを返す"""
+        dirty_rects = [self.draw_player_ui(), self.draw_stage_name()]
+        if settings.IS_DEBUG_MODE:
+            dirty_rects += self.draw_debug_info()
+        return dirty_rects
 
     def draw_player_ui(self):
         # Draw HP bar background (empty bar)
-        pygame.draw.rect(
+        bar_rect = pygame.draw.rect(
             self.surface,
             settings.COLORS["white"],
             (HP_BAR_POSITION, HP_BAR_SIZE),
@@ -54,12 +65,52 @@ class UI():
                     HP_BAR_SIZE[1] - 2 * HP_BAR_BORDER_WIDTH
                 )
             )
+        return bar_rect
 
     def draw_stage_name(self):
-        stage_name = self.map.map_data["map_name"]
-        stage_name_text = self.font.render(
+        stage_name = self.map.map_name
+        stage_name_text = FontCache.render(
             f"{stage_name}",
+            STAGE_NAME_FONT_SIZE,
+            settings.COLORS["white"]
+        )
+        return self.surface.blit(stage_name_text, STAGE_NAME_POSITION)
+
+    def draw_debug_info(self):
+        # 変形済みスプライトのキャッシュ状況を表示する
+        cache = self.player.transform_cache
+        debug_text = self.debug_font.render(
+            f"transform cache: {len(cache)}/{cache.max_size} "
+            f"hit {cache.hit_rate * 100:.1f}%",
+            True,
+            settings.COLORS["white"]
+        )
+        debug_rect = self.surface.blit(debug_text, DEBUG_INFO_POSITION)
+
+        # チャンク読み込みの待ち時間と先読みの失敗数を表示する
+        stats = self.map.loader.stats
+        stream_text = self.debug_font.render(
+            f"chunks: {len(self.map.active_chunks)} active "
+            f"{len(self.map.loader.loaded)} loaded  "
+            f"stall {stats.stalls} ({stats.max_stall * 1000:.1f}ms max) "
+            f"miss {stats.misses}",
+            True,
+            settings.COLORS["white"]
+        )
+        stream_rect = self.surface.blit(
+            stream_text,
+            (DEBUG_INFO_POSITION[0], DEBUG_INFO_POSITION[1] + debug_text.get_height()))
+
+        # スプライトシート・ステージのキャッシュ状況を表示する
+        sheets = SpriteSheetCache.stats()
+        stages = StageCache.stats()
+        cache_text = self.debug_font.render(
+            f"sheets: {sheets['sheets']} hit {sheets['hits']} miss {sheets['misses']}  "
+            f"stages: {stages['stages']} hit {stages['hits']} miss {stages['misses']}",
             True,
             settings.COLORS["white"]
         )
-        self.surface.blit(stage_name_text, STAGE_NAME_POSITION)
+        cache_rect = self.surface.blit(
+            cache_text,
+            (DEBUG_INFO_POSITION[0], stream_rect.bottom))
+        return [debug_rect, stream_rect, cache_rect]
@@ -0,0 +1,208 @@
+"""エージェントの学習用に、複数の Stage をまとめて進める環境 (Gym のベクトル環境に近い形)
+
+    env = VectorStageEnv(["n_stage1.json"], num_envs=16, seed=0)
+    obs = env.reset()
+    obs, rewards, terminated, truncated, infos = env.step(actions)
+
+actions は環境ごとの ACTIONS の番号の配列。観測は NumPy 配列の辞書で、
+環境の数を先頭の次元に持つ。描画は render() を呼んだときだけ行い、
+地形の描画レイヤーもその環境で初めて render() を呼んだときに作る。
+"""
+import random
+from headless import use_dummy_drivers, InputState, NullMixer
+import pygame
+import settings
+from sound_manager import NullSoundManager
+from stage import Stage
+
+try:
+    import numpy as np
+except ImportError:  # numpy がない環境では使えない
+    np = None
+
+# 1ステップの入力 (押すキーの組)
+ACTIONS = (
+    (),
+    (pygame.K_LEFT,),
+    (pygame.K_RIGHT,),
+    (pygame.K_SPACE,),
+    (pygame.K_LEFT, pygame.K_SPACE),
+    (pygame.K_RIGHT, pygame.K_SPACE),
+)
+VIEW_COLS = settings.WIDTH // settings.GRID_SIZE  # 観測する地形の範囲 (画面と同じ)
+VIEW_ROWS = settings.HEIGHT // settings.GRID_SIZE
+MAX_OBSERVED_ENEMIES = 32  # 観測に含める敵の数の上限
+MAX_EPISODE_STEPS = 3600
+CLEAR_REWARD = 10.0  # ゴールに着いたときの報酬
+DEATH_REWARD = -1.0  # やられたときの報酬
+DAMAGE_REWARD = -0.01  # HP 1 あたりの報酬
+
+
+class VectorStageEnv:
+    """num_envs 個の Stage を同じ入力の間隔で進める
+
+    観測 (observation) は次のキーを持つ辞書:
+      "tiles": (num_envs, VIEW_ROWS, VIEW_COLS) uint8  カメラに映る範囲の地形番号
+      "player": (num_envs, 5) float32  x, y, dx, dy, hp
+      "view_origin": (num_envs, 2) int32  tiles の左上のマスの位置
+      "enemies": (num_envs, MAX_OBSERVED_ENEMIES, 2) float32  敵の位置
+      "enemy_mask": (num_envs, MAX_OBSERVED_ENEMIES) bool  enemies のうち有効なもの
+    位置はすべてワールド座標 (ピクセル)。
+    報酬はプレイヤーが右に進んだマス数に、ダメージ・やられた・ゴールの分を足したもの。
+    ゴールに着くか、やられたら terminated、max_episode_steps を超えたら truncated になる。
+    auto_reset が True なら、終わった環境はその場で次のエピソードを始め、
+    終わった時点の観測を infos["final_observation"] に入れて返す。
+    """
+
+    def __init__(self, stage_files=None, num_envs=1, seed=None, headless=True,
+                 auto_reset=True, max_episode_steps=MAX_EPISODE_STEPS, use_enemy_system=None):
+        if np is None:
+            raise ImportError("VectorStageEnv を使うには numpy が必要です")
+        # headless でも render() で描画した画像は取得できる (ウィンドウを出さないだけ)
+        if headless:
+            use_dummy_drivers()
+        pygame.init()
+        self.surface = pygame.display.get_surface()
+        if self.surface is None:
+            self.surface = pygame.display.set_mode((settings.WIDTH, settings.HEIGHT))
+        self.stage_files = list(stage_files or settings.STAGE_FILE_NAMES)
+        self.num_envs = num_envs
+        self.auto_reset = auto_reset
+        self.max_episode_steps = max_episode_steps
+        self.action_count = len(ACTIONS)
+        self._seed_rngs = [random.Random() for _ in range(num_envs)]
+        self.input_states = [InputState() for _ in range(num_envs)]
+        self.stages = [
+            Stage(self.surface, self._stage_file(i), NullMixer(), NullSoundManager(),
+                  self.input_states[i], use_enemy_system=use_enemy_system, render=False)
+            for i in range(num_envs)
+        ]
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self._last_x = np.zeros(num_envs, dtype=np.int64)
+        self._last_hp = np.zeros(num_envs, dtype=np.int64)
+        self._last_deaths = np.zeros(num_envs, dtype=np.int64)
+        self._obs = {
+            "tiles": np.zeros((num_envs, VIEW_ROWS, VIEW_COLS), dtype=np.uint8),
+            "view_origin": np.zeros((num_envs, 2), dtype=np.int32),
+            "player": np.zeros((num_envs, 5), dtype=np.float32),
+            "enemies": np.zeros((num_envs, MAX_OBSERVED_ENEMIES, 2), dtype=np.float32),
+            "enemy_mask": np.zeros((num_envs, MAX_OBSERVED_ENEMIES), dtype=bool),
+        }
+        if seed is not None:
+            self.seed(seed)
+
+    def _stage_file(self, index):
+        return self.stage_files[index % len(self.stage_files)]
+
+    def seed(self, seed):
+        """環境 i のエピソードのシードを seed + i から決まる順に使う"""
+        for i, rng in enumerate(self._seed_rngs):
+            rng.seed(seed + i)
+
+    def reset(self, seed=None):
+        """すべての環境で新しいエピソードを始め、観測を返す"""
+        if seed is not None:
+            self.seed(seed)
+        for i in range(self.num_envs):
+            self._reset_env(i)
+        return self._observe()
+
+    def _reset_env(self, index):
+        stage = self.stages[index]
+        stage.load(self._stage_file(index), self._seed_rngs[index].getrandbits(32))
+        self.input_states[index].set(())
+        self.episode_steps[index] = 0
+        self._last_x[index] = stage.player.rect.x
+        self._last_hp[index] = stage.player.hp
+        self._last_deaths[index] = 0
+
+    def step(self, actions):
+        """各環境を1フレーム進める
+
+        (observation, rewards, terminated, truncated, infos) を返す。
+        """
+        rewards = np.zeros(self.num_envs, dtype=np.float32)
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        cleared = np.zeros(self.num_envs, dtype=bool)
+        for i, action in enumerate(actions):
+            stage = self.stages[i]
+            self.input_states[i].set(ACTIONS[action])
+            stage.update()
+            player = stage.player
+            # やられた場合はステージ内で初めの位置に戻っているので、進んだ分は数えない
+            if stage.deaths != self._last_deaths[i]:
+                rewards[i] = DEATH_REWARD
+                terminated[i] = True
+            else:
+                rewards[i] = (
+                    (player.rect.x - self._last_x[i]) / settings.GRID_SIZE
+                    + (self._last_hp[i] - player.hp) * DAMAGE_REWARD)
+                if stage.is_clearing:
+                    rewards[i] += CLEAR_REWARD
+                    terminated[i] = cleared[i] = True
+            self._last_x[i] = player.rect.x
+            self._last_hp[i] = player.hp
+            self._last_deaths[i] = stage.deaths
+        self.episode_steps += 1
+        truncated = ~terminated & (self.episode_steps >= self.max_episode_steps)
+
+        obs = self._observe()
+        infos = {"cleared": cleared, "episode_steps": self.episode_steps.copy()}
+        done = terminated | truncated
+        if self.auto_reset and done.any():
+            # 終わった時点の観測を残し、返す観測は次のエピソードの最初のものにする
+            infos["final_observation"] = obs
+            for i in np.flatnonzero(done):
+                self._reset_env(i)
+            obs = self._observe()
+        return obs, rewards, terminated, truncated, infos
+
+    def _observe(self):
+        for i in range(self.num_envs):
+            self._observe_env(i)
+        # 呼び出し側が書き換えても次のステップに影響しないようにコピーを返す
+        return {key: value.copy() for key, value in self._obs.items()}
+
+    def _observe_env(self, index):
+        stage = self.stages[index]
+        stage_map = stage.map
+        left = stage.camera.rect.x // settings.GRID_SIZE
+        top = stage.camera.rect.y // settings.GRID_SIZE
+        self._obs["view_origin"][index] = (left, top)
+
+        # カメラに映る範囲の地形 (マップの外は 0)
+        tiles = self._obs["tiles"][index]
+        tiles.fill(0)
+        grid = np.frombuffer(stage_map.tiles, dtype=np.uint8).reshape(
+            stage_map.height, stage_map.width)
+        view = grid[top:top + VIEW_ROWS, left:left + VIEW_COLS]
+        tiles[:view.shape[0], :view.shape[1]] = view
+
+        player = stage.player
+        self._obs["player"][index] = (
+            player.rect.x, player.rect.y, player.dx, player.dy, player.hp)
+
+        enemies = stage.enemies
+        count = min(len(enemies), MAX_OBSERVED_ENEMIES)
+        positions = self._obs["enemies"][index]
+        if stage.use_enemy_system:
+            positions[:count, 0] = enemies.x[:count]
+            positions[:count, 1] = enemies.y[:count]
+        else:
+            for j in range(count):
+                positions[j] = (enemies[j].x, enemies[j].y)
+        positions[count:] = 0
+        mask = self._obs["enemy_mask"][index]
+        mask[:count] = True
+        mask[count:] = False
+
+    def render(self, index=None):
+        """環境を描画し、(height, width, 3) の RGB 配列を返す (index を省略した場合は全ての環境の配列)"""
+        if index is None:
+            return np.stack([self.render(i) for i in range(self.num_envs)])
+        self.surface.fill(settings.COLORS["black"])
+        self.stages[index].draw()
+        return pygame.surfarray.array3d(self.surface).swapaxes(0, 1)
+
+    def close(self):
+        self.stages = []
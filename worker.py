@@ -0,0 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
+_executor = None  # 先読み処理で共有するワーカースレッド
+
+
+def submit(func, *args):
+    """func(*args) をワーカースレッドで実行し、Future を返す
+
+    チャンクやステージの先読みなど、メインループを止めたくない処理に使う。
+    ワーカースレッドは1本だけなので、依頼した順に実行される。
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Worker")
+    return _executor.submit(func, *args)